@@ -0,0 +1,394 @@
+#
+# asyncio Direct Test Mode client
+#
+# SPDX-License-Identifier: LicenseRef-LairdConnectivity-Clause
+#
+import asyncio
+import codec
+import logging
+import os
+from dtm import (
+    BAUD_RATE,
+    CHANNEL_MAX,
+    CHANNEL_MIN,
+    RESPONSE_SIZE,
+    SERIAL_TIMEOUT_SECONDS,
+    CommandType,
+    DTMCore,
+    Phy,
+    Region,
+    TestSetup,
+    VendorSpecific,
+)
+from sweep import ChannelDwell, SweepMode, SweepReport
+from transport import LoopbackTransport, Transport, open_transport
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncTransport:
+    """
+    Awaitable version of :py:class:`transport.Transport`.
+    """
+
+    def __init__(self, transport: Transport):
+        self.transport = transport
+        self.name = transport.name
+
+    async def write(self, data):
+        raise NotImplementedError
+
+    async def read_exact(self, size: int) -> bytes:
+        raise NotImplementedError
+
+    def close(self):
+        self.transport.close()
+
+
+class AsyncFdTransport(AsyncTransport):
+    """
+    Uses the event loop to wait for data from a transport with a file descriptor
+    (serial port on POSIX, pty, or socket).
+    """
+
+    def __init__(self, transport: Transport):
+        super().__init__(transport)
+        self.fd = transport.fileno()
+        os.set_blocking(self.fd, False)
+        self._loop = asyncio.get_running_loop()
+        self._rx = bytearray()
+        self._need = 0
+        self._waiter = None
+        self._loop.add_reader(self.fd, self._on_readable)
+
+    def _on_readable(self):
+        try:
+            data = os.read(self.fd, 4096)
+        except BlockingIOError:
+            return
+        if len(data) == 0:
+            # Other end closed
+            self._loop.remove_reader(self.fd)
+        self._rx += data
+        if self._waiter is not None and len(self._rx) >= self._need:
+            if not self._waiter.done():
+                self._waiter.set_result(None)
+
+    async def write(self, data):
+        view = memoryview(data)
+        while len(view) > 0:
+            try:
+                n = os.write(self.fd, view)
+            except BlockingIOError:
+                n = 0
+            view = view[n:]
+            if len(view) > 0:
+                await asyncio.sleep(0)
+
+    async def read_exact(self, size: int) -> bytes:
+        if len(self._rx) < size:
+            self._need = size
+            self._waiter = self._loop.create_future()
+            try:
+                await asyncio.wait_for(self._waiter, self.transport.timeout)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                self._waiter = None
+        b = bytes(self._rx[:size])
+        del self._rx[:size]
+        return b
+
+    def close(self):
+        self._loop.remove_reader(self.fd)
+        super().close()
+
+
+class AsyncLoopbackTransport(AsyncTransport):
+    """
+    In-process transport. The responder is called directly.
+    """
+
+    def __init__(self, transport: LoopbackTransport):
+        super().__init__(transport)
+        transport.timeout = 0
+
+    async def write(self, data):
+        self.transport.write(data)
+
+    async def read_exact(self, size: int) -> bytes:
+        return self.transport.read_exact(size)
+
+
+class AsyncThreadTransport(AsyncTransport):
+    """
+    Fallback for transports that can't be polled (e.g., serial ports on Windows).
+    Each read uses a worker thread.
+    """
+
+    async def write(self, data):
+        self.transport.write(data)
+
+    async def read_exact(self, size: int) -> bytes:
+        return await asyncio.to_thread(self.transport.read_exact, size)
+
+
+def wrap_transport(transport: Transport) -> AsyncTransport:
+    """
+    Select the most efficient way of awaiting a transport.
+    Must be called from a running event loop.
+    """
+    if isinstance(transport, LoopbackTransport):
+        return AsyncLoopbackTransport(transport)
+    try:
+        return AsyncFdTransport(transport)
+    except (OSError, NotImplementedError):
+        return AsyncThreadTransport(transport)
+
+
+class AsyncDTM(DTMCore):
+    """
+    Direct Test Mode for a Device Under Test (DUT) using asyncio.
+
+    Commands are encoded the same way as :py:class:`dtm.DTM`, but waiting for
+    responses and test durations doesn't block, so a single event loop can
+    drive many DUTs.
+
+    Use :py:meth:`open` to create an instance.
+    """
+
+    def __init__(self, transport: AsyncTransport, clock=None):
+        self._init_state(clock)
+        self.transport = transport
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    async def open(
+        cls, com_port: str = None, transport: Transport = None, clock=None
+    ):
+        """
+        Open the port to the device under test, send the reset command
+        and set the packet length to the maximum (see :py:meth:`dtm.DTM.__init__`).
+
+        :param str com_port: Communication port or transport URL
+        :param transport: If present, an already open transport to use instead of com_port
+        :param clock: If present, clock used to time tests
+        :raises Exception: if port cannot be opened or
+            reset and packet length commands cannot be sent
+        """
+        try:
+            if transport is None:
+                transport = open_transport(
+                    com_port, BAUD_RATE, SERIAL_TIMEOUT_SECONDS)
+            dut = cls(wrap_transport(transport), clock)
+            await dut.reset_cmd()
+            await dut.set_packet_length(dut.packet_length)
+        except Exception:
+            raise Exception("Device communication error")
+        return dut
+
+    def close(self):
+        self.transport.close()
+
+    async def _send_cmd(self, cmd: int, expect_packet: bool = False):
+        """
+        Send a message (16-bit command word) to the DUT and wait for the response.
+        """
+        b = cmd.to_bytes(2)
+        async with self._lock:
+            if logging.root.isEnabledFor(logging.DEBUG):
+                logging.debug("Tx %s", b.hex())
+            self.last_sent = self.clock.now()
+            await self.transport.write(b)
+            self.packet_count = -1
+            b = await self.transport.read_exact(RESPONSE_SIZE)
+            self.last_acked = self.clock.now()
+        if logging.root.isEnabledFor(logging.DEBUG):
+            logging.debug("Rx %s", b.hex())
+        rsp = codec.decode_bytes(b)
+        if expect_packet:
+            self._check_packet_count(rsp)
+        else:
+            self._check_success(rsp)
+
+    async def _send(self, cmd: int):
+        if cmd is not None:
+            await self._send_cmd(cmd)
+
+    async def reset_cmd(self):
+        """
+        Send a reset (test setup) command and expect success.
+        """
+        await self._send_cmd(self._reset_command())
+
+    async def end_test(self):
+        """
+        Send an end test command and expect a packet response.
+        """
+        await self._send_cmd(self._end_command(), True)
+
+    async def _adjust_power_for_region_and_antenna(self):
+        await self._send(self._region_power_command())
+
+    async def start_tx_test(self, freq=None, duration=0.0):
+        """
+        Start transmit test.
+
+        :param freq: If present, frequency in MHz (2402-2480) to use for test
+        :param duration: If greater than 0, the duration of the test in seconds
+        """
+        self.test.cmd = CommandType.TX.value
+        if freq is not None:
+            self.set_frequency(freq)
+        await self._adjust_power_for_region_and_antenna()
+        await self._send_cmd(self.test.word)
+        started = (self.last_sent, self.last_acked)
+        if duration > 0:
+            await self.clock.asleep(duration)
+            await self.end_test()
+            self._estimate_tx_packets(started, (self.last_sent, self.last_acked))
+
+    async def start_tx_sweep(self, duration=1.0, repeat_count: int = 0) -> SweepReport:
+        """
+        Transmit on all channels for duration in seconds.
+
+        Channel changes are scheduled at absolute deadlines (start + n * duration),
+        as in :py:meth:`dtm.DTM.sweep`, so the time taken by commands doesn't
+        accumulate.
+
+        :param duration: time to remain on each channel
+        :param int repeat_count: Number of times to repeat sweep
+        :returns: timing of each channel
+        """
+        report = SweepReport(SweepMode.TX, duration)
+        self.test.cmd = CommandType.TX.value
+        clock = self.clock
+        first = clock.now()
+        step = None
+        n = 0
+        for _ in range(-1, repeat_count):
+            for channel in range(CHANNEL_MIN, CHANNEL_MAX + 1):
+                deadline = first + n * duration
+                await clock.asleep(deadline - clock.now())
+                if step is not None:
+                    await self.end_test()
+                    step.end = self.last_sent
+                self.test.freq = channel
+                await self._adjust_power_for_region_and_antenna()
+                await self._send_cmd(self.test.word)
+                step = ChannelDwell(channel, deadline, self.last_sent, self.last_acked)
+                report.steps.append(step)
+                n += 1
+
+        if step is not None:
+            await clock.asleep(first + n * duration - clock.now())
+            await self.end_test()
+            step.end = self.last_sent
+        return report
+
+    async def start_rx_test(self, freq=None, duration=0.0):
+        """
+        Start receive test.
+
+        :param freq: If present, frequency in MHz (2402-2480) to use for test
+        :param duration: If greater than 0, the duration of the test in seconds
+        """
+        self.test.cmd = CommandType.RX.value
+        if freq is not None:
+            self.set_frequency(freq)
+        await self._send_cmd(self.test.word)
+        if duration > 0:
+            await self.clock.asleep(duration)
+            await self.end_test()
+
+    async def tx_constant_carrier(self, freq=None, duration=0.0):
+        """
+        Start a constant carrier test.
+
+        :param freq: If present, frequency in MHz (2402-2480) to use for test
+        :param duration: If greater than 0, the duration of the test in seconds
+        """
+        if freq is not None:
+            self.set_frequency(freq)
+        await self._send_cmd(
+            self._vs_command(VendorSpecific.CARRIER_TEST, self.test.freq)
+        )
+        if duration > 0:
+            await self.clock.asleep(duration)
+            await self.end_test()
+
+    async def set_tx_power(self, power: int):
+        """
+        Set the transmit power using a vendor specific command.
+        """
+        if self.region == Region.UNSET:
+            await self._send(self._tx_power_command(power))
+        else:
+            logging.error("Power cannot be set manually when a region is set")
+
+    async def set_fem_gain(self, gain: int):
+        """
+        Set the gain register of the FEM (1-31).
+        """
+        await self._send(self._fem_gain_command(gain))
+
+    async def configure_for_ce(self):
+        """
+        Configure the BL5340PA (nRF5340 output power and FEM gain)
+        for operation in Europe (CE).
+        """
+        if self.region_unset():
+            self.region = Region.CE
+            self._update_power_base()
+            await self._send(self._tx_power_command(-16))
+            # Gain of ~18 dB
+            await self.set_fem_gain(23)
+
+    async def configure_for_north_america(self, internal_antenna: bool = False):
+        """
+        Use FCC/IC power tables.
+        """
+        self._configure_region(Region.FCC_IC, internal_antenna)
+
+    async def configure_for_australia_nz(self, internal_antenna: bool = False):
+        """
+        Use RCM power tables.
+        """
+        self._configure_region(Region.RCM, internal_antenna)
+
+    async def _set_phy(self, param: Phy):
+        self._select_phy(param)
+        await self._send(self._test_setup_command(TestSetup.SET_PHY, param.value))
+
+    async def set_phy_1M(self):
+        """
+        Set physical layer to 1 Megabit/second (1 symbol per bit).
+        """
+        await self._set_phy(Phy.PHY_1M)
+
+    async def set_phy_2M(self):
+        """
+        Set physical layer to 2 Megabits/second.
+        """
+        await self._set_phy(Phy.PHY_2M)
+
+    async def set_phy_coded_s8(self):
+        """
+        Set physical layer to coded(8 symbols per bit)
+        """
+        await self._set_phy(Phy.CODED_PHY_S8)
+
+    async def set_phy_coded_s2(self):
+        """
+        Set physical layer to coded(2 symbols per bit)
+        """
+        await self._set_phy(Phy.CODED_PHY_S2)
+
+    async def set_packet_length(self, length: int):
+        """
+        Set the packet length (0-255).
+        """
+        ts = self._upper_length_command(length)
+        if ts is not None:
+            await self._send_cmd(ts)
+            self.packet_length = length
@@ -0,0 +1,132 @@
+#
+# Memory allocated by DTM while sweeping.
+#
+# The command path of a sweep (end test, set power, start) is run without
+# the per-channel report that DTM.sweep keeps.
+#
+# A transport that answers from a preallocated buffer is used so that only
+# allocations made by DTM are measured. Memory blocks still allocated after
+# sweeps of 120, 1200, and 12000 commands are counted with tracemalloc
+# snapshots and sys.getallocatedblocks(). The growth from the shortest to the
+# longest sweep divided by the extra commands is the number of blocks each
+# command allocates, and it must be 0 (the script fails otherwise). The blocks
+# that every sweep keeps (e.g., the last round trip time and free lists) cancel
+# out. Temporary objects (e.g., integers above 256) are freed as soon as a
+# command completes and don't count; the peak shows that they don't build up.
+#
+# python benchmarks/alloc.py
+#
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import codec
+from clock import VirtualClock
+from dtm import BATCH_MAX, CHANNEL_MAX, CHANNEL_MIN, DTM
+from transport import Transport
+
+
+class NullTransport(Transport):
+    """
+    Answers end test with an empty packet report and everything else with success.
+    """
+
+    def __init__(self):
+        self._timeout = 1
+        self._rsp = bytearray(BATCH_MAX * 2)
+        self._n = 0
+
+    def close(self):
+        pass
+
+    def write(self, data):
+        n = len(data)
+        for i in range(0, n, 2):
+            self._rsp[i] = 0x80 if (data[i] >> 6) == 3 else 0
+            self._rsp[i + 1] = 0
+        self._n = n
+
+    def readinto(self, buf) -> int:
+        n = self._n
+        for i in range(n):
+            buf[i] = self._rsp[i]
+        self._n = 0
+        return n
+
+
+def sweep(dut: DTM, repeat_count: int):
+    end = None
+    for _ in range(-1, repeat_count):
+        for channel in range(CHANNEL_MIN, CHANNEL_MAX + 1):
+            dut.test.freq = channel
+            dut.send_batch([end, dut._region_power_command(), dut.test.word])
+            end = codec.END_WORD
+    dut.end_test()
+
+
+def measure(dut: DTM, repeat_count: int) -> tuple:
+    """
+    :returns: commands sent, memory blocks and bytes still allocated after the
+        sweep (from tracemalloc), memory blocks still allocated (from the
+        interpreter's count), and peak bytes allocated
+    """
+    gc.collect()
+    gc.disable()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    blocks = sys.getallocatedblocks()
+    sweep(dut, repeat_count)
+    blocks = sys.getallocatedblocks() - blocks
+    after = tracemalloc.take_snapshot()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    gc.enable()
+    # Only count what the sweep allocated (not the snapshots)
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    diff = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "filename")
+    # A sweep step is end test, set power, and start
+    commands = 3 * (CHANNEL_MAX + 1) * (repeat_count + 1)
+    return (
+        commands,
+        sum(s.count_diff for s in diff),
+        sum(s.size_diff for s in diff),
+        blocks,
+        peak,
+    )
+
+
+def per_command(results: list) -> tuple:
+    """
+    Blocks allocated per command: the growth from the shortest to the longest
+    sweep (what a sweep keeps regardless of its length, e.g., a method cache,
+    cancels out).
+
+    :returns: (tracemalloc blocks, interpreter blocks) per command
+    """
+    first, last = results[0], results[-1]
+    commands = last[0] - first[0]
+    return (last[1] - first[1]) / commands, (last[3] - first[3]) / commands
+
+
+def run() -> list:
+    dut = DTM(transport=NullTransport(), clock=VirtualClock())
+    dut.configure_for_north_america()
+    # Warm up (e.g., power table lookups, method caches, and counters that
+    # have grown past the cached small integers)
+    sweep(dut, 9)
+    return [measure(dut, repeat_count) for repeat_count in (0, 9, 99)]
+
+
+if __name__ == "__main__":
+    results = run()
+    for commands, count, size, blocks, peak in results:
+        print(
+            f"{commands:6} commands: {count:4} blocks ({size:5} bytes) retained "
+            f"({blocks:4} blocks counted by the interpreter), {peak:6} bytes peak"
+        )
+    traced, counted = per_command(results)
+    print(f"blocks per command: {traced:.4f} (interpreter {counted:.4f})")
+    assert traced == 0 and counted == 0, "the command path allocates memory per command"
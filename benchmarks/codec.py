@@ -0,0 +1,38 @@
+#
+# Encode/decode throughput of the integer codec compared to the ctypes unions.
+#
+# python benchmarks/codec.py
+#
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import codec
+from dtm import Command, Response
+
+N = 200000
+
+CASES = {
+    "ctypes encode TX start": lambda: Command(cmd=2, freq=19, length=63, pkt=0).word,
+    "codec encode TX start": lambda: codec.tx_start_word(19, 63, 0),
+    "ctypes encode VS": lambda: Command(cmd=2, freq=-16, length=2, pkt=3).word,
+    "codec encode VS": lambda: codec.vs_word(2, -16),
+    "ctypes decode report": lambda: Response(
+        word=int.from_bytes(b"\x81\x80", "big")
+    ).report.packet_count,
+    "codec decode report": lambda: codec.decode_bytes(b"\x81\x80"),
+}
+
+
+def run(n: int = N) -> dict:
+    """
+    :returns: operations per second for each case
+    """
+    return {name: n / timeit.timeit(f, number=n) for name, f in CASES.items()}
+
+
+if __name__ == "__main__":
+    for name, rate in run().items():
+        print(f"{name:24} {rate / 1e6:8.2f} M/s")
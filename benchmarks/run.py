@@ -0,0 +1,209 @@
+#
+# Benchmark suite for the command path.
+#
+# DTM is run against an in-memory simulated DUT (no I/O) and a simulated DUT
+# served over a pty by a thread (kernel I/O, as with a USB-serial adapter).
+# Tests use a virtual clock, so sweep times only include command time.
+#
+# Results are printed and saved as JSON so that runs can be compared between
+# releases.
+#
+# python benchmarks/run.py [-o results.json] [-n commands]
+#
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+import timeit
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from clock import VirtualClock
+from dtm import DTM
+from simulator import RadioMedium, SimulatedDUT
+from transport import LoopbackTransport, PtyTransport
+
+
+class PtyDUT:
+    """
+    Simulated DUT answering on the peer side of a pty.
+    """
+
+    def __init__(self, medium: RadioMedium):
+        self.sim = SimulatedDUT(medium, "pty")
+        self.transport = PtyTransport()
+        self._fd = os.open(self.transport.peer_name, os.O_RDWR | os.O_NOCTTY)
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def _serve(self):
+        while True:
+            try:
+                data = os.read(self._fd, 64)
+            except OSError:
+                return
+            if len(data) == 0:
+                return
+            os.write(self._fd, self.sim(data))
+
+    def close(self):
+        os.close(self._fd)
+        self.transport.close()
+
+
+def percentiles(samples: list) -> dict:
+    samples = sorted(samples)
+    n = len(samples)
+    return {
+        f"p{p}": samples[min(n - 1, int(n * p / 100))] * 1e6 for p in (50, 90, 99)
+    } | {"max": samples[-1] * 1e6}
+
+
+def command_latency(dut: DTM, n: int) -> dict:
+    """
+    Time single commands (reset) that can't be suppressed by the register cache.
+    """
+    samples = []
+    now = time.perf_counter
+    for _ in range(n):
+        start = now()
+        dut.reset_cmd()
+        samples.append(now() - start)
+    total = sum(samples)
+    return {"commands_per_second": n / total, "latency_us": percentiles(samples)}
+
+
+def sweep_time(dut: DTM, repeat: int = 5) -> dict:
+    """
+    Wall time of a transmit sweep of all channels (with a region power table).
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        dut.start_tx_sweep(duration=1.0)
+        times.append(time.perf_counter() - start)
+    return {"sweep_ms": min(times) * 1e3}
+
+
+def run_transport(name: str, dut: DTM, n: int) -> dict:
+    result = {"transport": name}
+    result |= command_latency(dut, n)
+    result |= sweep_time(dut)
+    return result
+
+
+def power_lookup(n: int = 200000) -> dict:
+    """
+    Cost of finding the transmit power for a channel.
+    """
+    dut = DTM(transport=LoopbackTransport(SimulatedDUT()), clock=VirtualClock())
+    dut.configure_for_north_america()
+    return {
+        "region_power_ns": timeit.timeit(dut._region_power, number=n) / n * 1e9,
+        "region_power_command_ns": timeit.timeit(
+            dut._region_power_command, number=n
+        )
+        / n
+        * 1e9,
+    }
+
+
+def power_table_load(repeat: int = 20) -> dict:
+    """
+    Time to load a region table from its text file (parse and compile)
+    and from the compiled cache.
+    """
+    import power_table
+
+    def load():
+        power_table._regions.clear()
+        return power_table.load_region("FCC_IC")
+
+    def parse():
+        power_table.compile_region(
+            power_table.parse_region(power_table._read_region("FCC_IC").decode())
+        )
+
+    load()
+    return {
+        "power_table_parse_us": min(timeit.repeat(parse, number=1, repeat=repeat)) * 1e6,
+        "power_table_cached_us": min(timeit.repeat(load, number=1, repeat=repeat)) * 1e6,
+    }
+
+
+def import_time(module: str = "dtm", repeat: int = 5) -> dict:
+    """
+    Time to import a module in a new interpreter (best of repeat).
+    """
+    code = (
+        "import time; t = time.perf_counter(); "
+        f"import {module}; print(time.perf_counter() - t)"
+    )
+    times = [
+        float(
+            subprocess.run(
+                [sys.executable, "-c", code],
+                cwd=ROOT,
+                capture_output=True,
+                check=True,
+                text=True,
+            ).stdout
+        )
+        for _ in range(repeat)
+    ]
+    return {f"import_{module}_ms": min(times) * 1e3}
+
+
+def run(n: int = 2000) -> dict:
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "transports": [],
+    }
+    medium = RadioMedium(VirtualClock())
+    memory = DTM(
+        transport=LoopbackTransport(SimulatedDUT(medium, "memory")), clock=medium.clock
+    )
+    memory.configure_for_north_america()
+    results["transports"].append(run_transport("memory", memory, n))
+    if hasattr(os, "openpty"):
+        pty = PtyDUT(medium)
+        try:
+            dut = DTM(transport=pty.transport, clock=medium.clock)
+            dut.configure_for_north_america()
+            results["transports"].append(run_transport("pty", dut, n))
+        finally:
+            pty.close()
+    results |= power_lookup()
+    results |= power_table_load()
+    results |= import_time()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="DTM command path benchmarks")
+    parser.add_argument("-o", "--output", help="JSON file for the results")
+    parser.add_argument("-n", type=int, default=2000, help="commands to time")
+    args = parser.parse_args()
+    results = run(args.n)
+    for t in results["transports"]:
+        latency = t["latency_us"]
+        print(
+            f"{t['transport']:8} {t['commands_per_second']:10.0f} commands/s  "
+            f"p50 {latency['p50']:7.1f} us  p99 {latency['p99']:7.1f} us  "
+            f"sweep {t['sweep_ms']:7.2f} ms"
+        )
+    print(f"power lookup {results['region_power_ns']:.0f} ns "
+          f"(command {results['region_power_command_ns']:.0f} ns)")
+    print(f"power table parse {results['power_table_parse_us']:.0f} us "
+          f"(cached {results['power_table_cached_us']:.0f} us)")
+    print(f"import dtm {results['import_dtm_ms']:.1f} ms")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,248 @@
+#
+# Recording and replay of the bytes exchanged with a DUT
+#
+# SPDX-License-Identifier: LicenseRef-LairdConnectivity-Clause
+#
+# A capture file is MAGIC followed by records of:
+#   time (little endian double, seconds since the first record)
+#   direction (byte, wire_trace.TX or wire_trace.RX)
+#   length (little endian unsigned short)
+#   data
+#
+import logging
+import struct
+from clock import SYSTEM_CLOCK
+from transport import Transport, register_transport
+from wire_trace import RX, TX
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"DTMCAP\x01\n"
+_HEADER = struct.Struct("<dBH")
+
+
+def read_capture(path: str) -> list:
+    """
+    :returns: (time, direction, data) of each record in the file
+    :raises Exception: if the file isn't a capture
+    """
+    with open(path, "rb") as f:
+        b = f.read()
+    if not b.startswith(MAGIC):
+        raise Exception("Not a DTM capture file")
+    records = []
+    offset = len(MAGIC)
+    while offset + _HEADER.size <= len(b):
+        t, direction, length = _HEADER.unpack_from(b, offset)
+        offset += _HEADER.size
+        records.append((t, direction, b[offset : offset + length]))
+        offset += length
+    return records
+
+
+class RecordingTransport(Transport):
+    """
+    Write everything sent and received by another transport to a capture file.
+    """
+
+    def __init__(self, transport: Transport, path: str, clock=None):
+        self.transport = transport
+        self.name = transport.name
+        self.clock = SYSTEM_CLOCK if clock is None else clock
+        self.file = open(path, "wb")
+        self.file.write(MAGIC)
+        self._start = None
+
+    def _add(self, direction: int, data):
+        now = self.clock.now()
+        if self._start is None:
+            self._start = now
+        self.file.write(_HEADER.pack(now - self._start, direction, len(data)))
+        self.file.write(data)
+
+    def open(self):
+        self.transport.open()
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+        self.transport.close()
+
+    def write(self, data):
+        self._add(TX, data)
+        self.transport.write(data)
+
+    def read_exact(self, size: int) -> bytes:
+        b = self.transport.read_exact(size)
+        if len(b) > 0:
+            self._add(RX, b)
+        return b
+
+    def readinto(self, buf) -> int:
+        n = self.transport.readinto(buf)
+        if n > 0:
+            self._add(RX, buf[:n])
+        return n
+
+    def flush(self):
+        self.transport.flush()
+        self.file.flush()
+
+    def reset_input_buffer(self):
+        self.transport.reset_input_buffer()
+
+    @property
+    def timeout(self) -> float:
+        return self.transport.timeout
+
+    @timeout.setter
+    def timeout(self, value: float):
+        self.transport.timeout = value
+
+    @property
+    def baudrate(self) -> int:
+        return self.transport.baudrate
+
+    @baudrate.setter
+    def baudrate(self, value: int):
+        self.transport.baudrate = value
+
+
+class ReplayTransport(Transport):
+    """
+    Play the DUT side of a capture.
+
+    Each write is compared with the next bytes that were sent in the capture;
+    differences are kept in :py:attr:`mismatches`. The bytes that were received
+    after them are then returned by reads.
+
+    :param records: capture file name or records from :py:func:`read_capture`
+    :param bool realtime: If True, responses are delayed until the time they were
+        received in the capture (relative to the first write). Otherwise they are
+        available immediately.
+    """
+
+    def __init__(self, records, realtime: bool = False, clock=None, name: str = None):
+        if isinstance(records, str):
+            if name is None:
+                name = f"replay://{records}"
+            records = read_capture(records)
+        self.records = records
+        self.realtime = realtime
+        self.clock = SYSTEM_CLOCK if clock is None else clock
+        self.name = "replay://" if name is None else name
+        self.mismatches = []
+        """(record index, expected bytes, written bytes)"""
+        self._timeout = 0
+        self._pos = 0
+        self._start = None
+        self._rx = []
+
+    def open(self):
+        self._pos = 0
+        self._start = None
+        self._rx = []
+        self.mismatches = []
+
+    def close(self):
+        pass
+
+    @property
+    def done(self) -> bool:
+        """
+        True if all records have been replayed.
+        """
+        return self._pos >= len(self.records) and len(self._rx) == 0
+
+    def write(self, data):
+        data = bytes(data)
+        records = self.records
+        if self._start is None:
+            self._start = self.clock.now()
+        first = self._pos
+        expected = b""
+        while (
+            len(expected) < len(data)
+            and self._pos < len(records)
+            and records[self._pos][1] == TX
+        ):
+            expected += records[self._pos][2]
+            self._pos += 1
+        if expected != data:
+            logger.error(
+                "Replay mismatch at record %d: expected %s, got %s",
+                first,
+                expected.hex(),
+                data.hex(),
+            )
+            self.mismatches.append((first, expected, data))
+        while self._pos < len(records) and records[self._pos][1] == RX:
+            self._rx.append(records[self._pos])
+            self._pos += 1
+
+    def _take(self, size: int) -> bytes:
+        b = b""
+        while len(b) < size and len(self._rx) > 0:
+            t, _, data = self._rx[0]
+            if self.realtime:
+                self.clock.sleep(self._start + t - self.clock.now())
+            need = size - len(b)
+            b += data[:need]
+            if len(data) > need:
+                self._rx[0] = (t, RX, data[need:])
+            else:
+                del self._rx[0]
+        return b
+
+    def read_exact(self, size: int) -> bytes:
+        return self._take(size)
+
+    def readinto(self, buf) -> int:
+        b = self._take(len(buf))
+        buf[: len(b)] = b
+        return len(b)
+
+    def reset_input_buffer(self):
+        self._rx = []
+
+
+def replay_against(records, transport: Transport, realtime: bool = False, clock=None) -> list:
+    """
+    Send the commands of a capture to a DUT (e.g., a simulator or a board) and
+    compare its responses with the capture.
+
+    :param records: capture file name or records from :py:func:`read_capture`
+    :param bool realtime: If True, commands are sent at the times they were sent
+        in the capture. Otherwise they are sent as fast as possible.
+    :returns: (record index, expected bytes, received bytes) of each difference
+    """
+    if isinstance(records, str):
+        records = read_capture(records)
+    clock = SYSTEM_CLOCK if clock is None else clock
+    start = clock.now()
+    mismatches = []
+    i = 0
+    while i < len(records):
+        t, direction, data = records[i]
+        if direction == TX:
+            if realtime:
+                clock.sleep(start + t - clock.now())
+            transport.write(data)
+            i += 1
+            continue
+        first = i
+        expected = b""
+        while i < len(records) and records[i][1] == RX:
+            expected += records[i][2]
+            i += 1
+        received = transport.read_exact(len(expected))
+        if received != expected:
+            mismatches.append((first, expected, received))
+    return mismatches
+
+
+def _open_replay(address: str, baudrate: int, timeout: float):
+    return ReplayTransport(address)
+
+
+register_transport("replay", _open_replay)
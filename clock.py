@@ -0,0 +1,61 @@
+#
+# Clocks used by DTM to time tests
+#
+# SPDX-License-Identifier: LicenseRef-LairdConnectivity-Clause
+#
+import time
+
+
+class SystemClock:
+    """
+    Wall clock. Time is in seconds from an arbitrary (monotonic) reference.
+    """
+
+    def now(self) -> float:
+        return time.perf_counter()
+
+    def sleep(self, seconds: float):
+        if seconds > 0:
+            time.sleep(seconds)
+
+    async def asleep(self, seconds: float):
+        import asyncio
+
+        await asyncio.sleep(max(seconds, 0))
+
+
+class VirtualClock:
+    """
+    Clock that only advances when sleep is called.
+
+    Sharing a virtual clock between :py:class:`dtm.DTM` and a
+    :py:class:`simulator.SimulatedDUT` allows tests that take hours on hardware
+    to run in milliseconds.
+    """
+
+    def __init__(self, start: float = 0.0):
+        self._now = start
+
+    def now(self) -> float:
+        return self._now
+
+    def sleep(self, seconds: float):
+        if seconds > 0:
+            self._now += seconds
+
+    async def asleep(self, seconds: float):
+        import asyncio
+
+        self.sleep(seconds)
+        # Let other tasks run
+        await asyncio.sleep(0)
+
+    def advance(self, seconds: float):
+        """
+        Move time forward without sleeping.
+        """
+        self.sleep(seconds)
+
+
+SYSTEM_CLOCK = SystemClock()
+"""Default clock used by DTM"""
@@ -0,0 +1,168 @@
+#
+# Integer encoding and decoding of Direct Test Mode commands and responses
+#
+# SPDX-License-Identifier: LicenseRef-LairdConnectivity-Clause
+#
+# The bit layout is the same as CommandBits/AltTestSetupBits and
+# StatusEventBits/PacketReportEventBits in dtm.py, but no ctypes objects are
+# created. Command words for start tests and vendor specific commands are
+# precomputed. Responses are decoded with a single table lookup.
+#
+from array import array
+
+# Command field positions (CommandBits)
+CMD_SHIFT = 14
+FREQ_SHIFT = 8
+LENGTH_SHIFT = 2
+FIELD_MASK = 0x3F
+
+# Values match dtm.CommandType and dtm.PacketType
+CMD_TEST_SETUP = 0
+CMD_RX = 1
+CMD_TX = 2
+CMD_END = 3
+PKT_VS = 3
+
+CHANNELS = 40
+LENGTHS = 64
+PACKET_TYPES = 3
+VS_COMMANDS = 7
+
+RESET_WORD = CMD_TEST_SETUP << CMD_SHIFT
+END_WORD = CMD_END << CMD_SHIFT
+
+# Decoded responses. Packet reports decode to the packet count (>= 0).
+STATUS_SUCCESS = -1
+STATUS_FAILURE = -2
+NO_RESPONSE = -3
+PACKET_COUNT_MASK = 0x7FFF
+
+
+def encode(cmd: int, freq: int, length: int, pkt: int) -> int:
+    """
+    Encode the fields of a command (see dtm.CommandBits).
+
+    Fields are truncated to their width (e.g., negative transmit power
+    in the frequency field).
+    """
+    return (
+        ((cmd & 3) << CMD_SHIFT)
+        | ((freq & FIELD_MASK) << FREQ_SHIFT)
+        | ((length & FIELD_MASK) << LENGTH_SHIFT)
+        | (pkt & 3)
+    )
+
+
+def _start_table(cmd: int) -> array:
+    # Same words as encode(cmd, channel, length, pkt), built a row of
+    # channels at a time because this runs on import.
+    row = [cmd << CMD_SHIFT | channel << FREQ_SHIFT for channel in range(CHANNELS)]
+    table = array("H")
+    for pkt in range(PACKET_TYPES):
+        for length in range(LENGTHS):
+            low = length << LENGTH_SHIFT | pkt
+            table.extend([word | low for word in row])
+    return table
+
+
+TX_START = _start_table(CMD_TX)
+"""Transmit test command words indexed by (packet type, lower length, channel)"""
+RX_START = _start_table(CMD_RX)
+"""Receive test command words indexed by (packet type, lower length, channel)"""
+VS_WORDS = array(
+    "H",
+    [
+        encode(CMD_TX, param, sub_cmd, PKT_VS)
+        for sub_cmd in range(VS_COMMANDS)
+        for param in range(FIELD_MASK + 1)
+    ],
+)
+"""Vendor specific command words indexed by (command, parameter)"""
+
+RESPONSES = array("i", [STATUS_SUCCESS, STATUS_FAILURE]) * (
+    PACKET_COUNT_MASK + 1 >> 1
+) + array("i", range(PACKET_COUNT_MASK + 1))
+"""Response word to decoded value (status or packet count)"""
+
+
+def tx_start_word(channel: int, length: int, pkt: int) -> int:
+    return TX_START[(pkt * LENGTHS + length) * CHANNELS + channel]
+
+
+def rx_start_word(channel: int, length: int, pkt: int) -> int:
+    return RX_START[(pkt * LENGTHS + length) * CHANNELS + channel]
+
+
+def vs_word(sub_cmd: int, param: int) -> int:
+    """
+    Vendor specific command. The parameter is sent in the frequency field.
+    """
+    return VS_WORDS[sub_cmd * (FIELD_MASK + 1) + (param & FIELD_MASK)]
+
+
+def test_setup_word(control: int, param: int, alt: bool = False) -> int:
+    """
+    Test setup command. The parameter is sent in the length field
+    or, if alt, in the combined length and packet fields (see dtm.AltTestSetupBits).
+    """
+    if alt:
+        return (control & FIELD_MASK) << FREQ_SHIFT | (param & 0xFF)
+    return encode(CMD_TEST_SETUP, control, param, 0)
+
+
+def command_type(word: int) -> int:
+    return word >> CMD_SHIFT
+
+
+def decode(word: int) -> int:
+    """
+    Decode a response word.
+
+    :returns: packet count for a packet report, otherwise
+        :py:data:`STATUS_SUCCESS` or :py:data:`STATUS_FAILURE`
+    """
+    return RESPONSES[word]
+
+
+def decode_bytes(b) -> int:
+    """
+    Decode a (big endian) response.
+
+    :returns: :py:data:`NO_RESPONSE` if b isn't 2 bytes, otherwise see :py:func:`decode`
+    """
+    if len(b) != 2:
+        return NO_RESPONSE
+    return RESPONSES[(b[0] << 8) | b[1]]
+
+
+def status_data(word: int) -> int:
+    """
+    14-bit data field of a status event (e.g., read supported features).
+    """
+    return (word >> 1) & 0x3FFF
+
+
+class TestCommand:
+    """
+    Start test command (receive or transmit).
+
+    The fields are the same as dtm.CommandBits. :py:attr:`word` is a table lookup.
+    """
+
+    __slots__ = ("cmd", "freq", "length", "pkt")
+
+    def __init__(self, cmd: int, freq: int, length: int, pkt: int):
+        self.cmd = cmd
+        self.freq = freq
+        self.length = length
+        self.pkt = pkt
+
+    @property
+    def word(self) -> int:
+        if self.pkt < PACKET_TYPES and self.freq < CHANNELS:
+            i = (self.pkt * LENGTHS + self.length) * CHANNELS + self.freq
+            if self.cmd == CMD_TX:
+                return TX_START[i]
+            elif self.cmd == CMD_RX:
+                return RX_START[i]
+        return encode(self.cmd, self.freq, self.length, self.pkt)
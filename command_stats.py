@@ -0,0 +1,147 @@
+#
+# Counters and latency histograms for each type of command
+#
+# SPDX-License-Identifier: LicenseRef-LairdConnectivity-Clause
+#
+from array import array
+import codec
+
+# Command kinds: 64 test setup subcommands, receive start, transmit start,
+# 64 vendor specific subcommands, and end test.
+SETUP_KINDS = 0
+RX_KIND = 64
+TX_KIND = 65
+VS_KINDS = 66
+END_KIND = 130
+KINDS = 131
+
+BUCKETS = 22
+"""Latency histogram buckets. Bucket n counts latencies of 2**(n-1) to 2**n - 1 us
+(bucket 0 is < 1 us and the last bucket is everything longer)."""
+
+
+def command_kind(word: int) -> int:
+    """
+    Index of the type of a command word (e.g., :py:data:`TX_KIND`).
+    """
+    cmd = word >> codec.CMD_SHIFT
+    if cmd == codec.CMD_TEST_SETUP:
+        return SETUP_KINDS + ((word >> codec.FREQ_SHIFT) & codec.FIELD_MASK)
+    elif cmd == codec.CMD_END:
+        return END_KIND
+    elif cmd == codec.CMD_RX:
+        return RX_KIND
+    elif (word & 3) == codec.PKT_VS:
+        return VS_KINDS + ((word >> codec.LENGTH_SHIFT) & codec.FIELD_MASK)
+    return TX_KIND
+
+
+def kind_name(kind: int) -> str:
+    from dtm import TestSetup, VendorSpecific
+
+    if kind == RX_KIND:
+        return "RX"
+    elif kind == TX_KIND:
+        return "TX"
+    elif kind == END_KIND:
+        return "END"
+    elif kind >= VS_KINDS:
+        n = kind - VS_KINDS
+        names = {v.value: v.name for v in VendorSpecific}
+        return "VS_" + names.get(n, str(n))
+    names = {
+        (v.value[0] if isinstance(v.value, tuple) else v.value): v.name
+        for v in TestSetup
+    }
+    return "SETUP_" + names.get(kind, str(kind))
+
+
+def bucket_label(bucket: int) -> str:
+    if bucket == 0:
+        return "<1us"
+    elif bucket == BUCKETS - 1:
+        return f">={1 << (bucket - 1)}us"
+    return f"<{1 << bucket}us"
+
+
+class CommandStats:
+    """
+    Number of commands, failures, timeouts, retries, and a latency histogram
+    for each kind of command.
+
+    Recording a command is a few array updates, so statistics can be left on.
+    Latency is the time from writing a command (or batch) until the response
+    is received.
+    """
+
+    __slots__ = ("_histogram", "_failures", "_timeouts", "_retries", "_total", "_max")
+
+    def __init__(self):
+        self._histogram = array("q", [0]) * (KINDS * BUCKETS)
+        self._failures = array("q", [0]) * KINDS
+        self._timeouts = array("q", [0]) * KINDS
+        self._retries = array("q", [0]) * KINDS
+        self._total = array("d", [0.0]) * KINDS
+        self._max = array("d", [0.0]) * KINDS
+
+    def record(self, word: int, latency: float, ok: bool, timeout: bool):
+        kind = command_kind(word)
+        bucket = int(latency * 1e6).bit_length()
+        if bucket >= BUCKETS:
+            bucket = BUCKETS - 1
+        self._histogram[kind * BUCKETS + bucket] += 1
+        self._total[kind] += latency
+        if latency > self._max[kind]:
+            self._max[kind] = latency
+        if timeout:
+            self._timeouts[kind] += 1
+        elif not ok:
+            self._failures[kind] += 1
+
+    def retry(self, word: int):
+        """
+        Count a command that is being sent again after a timeout.
+        """
+        self._retries[command_kind(word)] += 1
+
+    def reset(self):
+        for a in (
+            self._histogram,
+            self._failures,
+            self._timeouts,
+            self._retries,
+            self._total,
+            self._max,
+        ):
+            for i in range(len(a)):
+                a[i] = 0
+
+    def snapshot(self) -> dict:
+        """
+        :returns: kind name to counters (only kinds that have been sent)
+            and "total" for all commands
+        """
+        result = {}
+        totals = {"count": 0, "failures": 0, "timeouts": 0, "retries": 0}
+        for kind in range(KINDS):
+            row = self._histogram[kind * BUCKETS : (kind + 1) * BUCKETS]
+            count = sum(row)
+            if count == 0:
+                continue
+            result[kind_name(kind)] = {
+                "count": count,
+                "failures": self._failures[kind],
+                "timeouts": self._timeouts[kind],
+                "retries": self._retries[kind],
+                "mean_us": self._total[kind] / count * 1e6,
+                "max_us": self._max[kind] * 1e6,
+                "histogram": {
+                    bucket_label(b): n for b, n in enumerate(row) if n > 0
+                },
+            }
+            totals["count"] += count
+            totals["failures"] += self._failures[kind]
+            totals["timeouts"] += self._timeouts[kind]
+            totals["retries"] += self._retries[kind]
+        result["total"] = totals
+        return result
@@ -0,0 +1,157 @@
+#
+# Finding the ports that have Direct Test Mode firmware
+#
+# SPDX-License-Identifier: LicenseRef-LairdConnectivity-Clause
+#
+# Ports are probed in parallel, so checking many ports takes about one
+# timeout. The probe is a pair of reset commands (harmless for DTM firmware);
+# the read supported features and read maximum commands are only sent to
+# ports that answer it.
+#
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import codec
+from dtm import BAUD_RATE, RESPONSE_SIZE, TestSetup, remember_baud_rate
+from transport import open_transport
+
+logger = logging.getLogger(__name__)
+
+PROBE_TIMEOUT_SECONDS = 0.1
+MAX_WORKERS = 64
+
+FEATURES = (
+    "data_length_extension",
+    "phy_2m",
+    "stable_modulation_index",
+    "coded_phy",
+    "constant_tone_extension",
+)
+"""Names of the bits returned by the read supported features command"""
+
+MAX_VALUES = {"max_tx_octets": 0, "max_rx_octets": 2}
+"""Values read with the read maximum command (name to parameter).
+The maximum times don't fit in the 14-bit response, so they aren't read."""
+MAX_OCTETS_RANGE = (27, 251)
+"""Valid maximum packet lengths (a device that echoes commands returns values outside of it)"""
+
+
+def candidate_ports() -> list:
+    """
+    Serial ports of this computer (requires pyserial).
+    """
+    from serial.tools import list_ports
+
+    return [p.device for p in list_ports.comports()]
+
+
+def _exchange(transport, words: list) -> list:
+    """
+    :returns: response words or None if they weren't all received
+    """
+    transport.write(b"".join(w.to_bytes(2, "big") for w in words))
+    b = transport.read_exact(len(words) * RESPONSE_SIZE)
+    if len(b) != len(words) * RESPONSE_SIZE:
+        return None
+    return [int.from_bytes(b[i : i + 2], "big") for i in range(0, len(b), 2)]
+
+
+def _identify(transport) -> dict:
+    """
+    :returns: capabilities or None if the port doesn't answer like DTM firmware
+    """
+    transport.reset_input_buffer()
+    if _exchange(transport, [codec.RESET_WORD, codec.RESET_WORD]) != [0, 0]:
+        return None
+    words = [codec.test_setup_word(TestSetup.READ_SUPPORTED.value, 0)] + [
+        codec.test_setup_word(TestSetup.READ_MAX.value[0], param)
+        for param in MAX_VALUES.values()
+    ]
+    rsp = _exchange(transport, words)
+    if rsp is None or any(w >= 0x8000 for w in rsp) or rsp[0] & 1:
+        return None
+    features = codec.status_data(rsp[0])
+    info = {
+        "feature_bits": features,
+        "features": [name for bit, name in enumerate(FEATURES) if (features >> bit) & 1],
+    }
+    low, high = MAX_OCTETS_RANGE
+    for name, word in zip(MAX_VALUES, rsp[1:]):
+        if word & 1:
+            # Not supported by the firmware
+            info[name] = None
+            continue
+        value = codec.status_data(word)
+        if value < low or value > high:
+            return None
+        info[name] = value
+    return info
+
+
+def probe_port(
+    port: str, baud_rates: list = (BAUD_RATE,), timeout: float = PROBE_TIMEOUT_SECONDS
+) -> dict:
+    """
+    Check if a port has DTM firmware.
+
+    The baud rate that works is remembered for the port
+    (see the probe_baud_rates parameter of :py:class:`dtm.DTM`).
+
+    :param str port: Communication port or transport URL
+    :param list baud_rates: Baud rates to try (in order)
+    :param float timeout: Time to wait for each response
+    :returns: None if the port can't be opened or doesn't answer. Otherwise
+        baud_rate, feature_bits, features (names from :py:data:`FEATURES`),
+        and the :py:data:`MAX_VALUES` (None if the firmware doesn't support them).
+    """
+    try:
+        transport = open_transport(port, baud_rates[0], timeout)
+    except Exception as e:
+        logger.debug("%s can't be opened: %s", port, e)
+        return None
+    try:
+        for rate in baud_rates:
+            transport.baudrate = rate
+            info = _identify(transport)
+            if info is not None:
+                remember_baud_rate(transport.name, rate)
+                return {"baud_rate": rate} | info
+    except Exception as e:
+        logger.debug("%s probe failed: %s", port, e)
+    finally:
+        transport.close()
+    return None
+
+
+def discover(
+    ports: list = None,
+    baud_rates: list = (BAUD_RATE,),
+    timeout: float = PROBE_TIMEOUT_SECONDS,
+    max_workers: int = MAX_WORKERS,
+) -> dict:
+    """
+    Find the ports that answer DTM commands.
+
+    All ports are probed at the same time (up to max_workers),
+    so this takes about one timeout for each baud rate.
+
+    :param list ports: Ports or transport URLs to check
+        (default is :py:func:`candidate_ports`)
+    :returns: port to capabilities (see :py:func:`probe_port`)
+        for each port that answered
+    """
+    if ports is None:
+        ports = candidate_ports()
+    found = {}
+    if len(ports) == 0:
+        return found
+    with ThreadPoolExecutor(min(max_workers, len(ports))) as executor:
+        futures = [
+            (port, executor.submit(probe_port, port, baud_rates, timeout))
+            for port in ports
+        ]
+        for port, future in futures:
+            info = future.result()
+            if info is not None:
+                found[port] = info
+    logger.info("%d of %d ports answered DTM", len(found), len(ports))
+    return found
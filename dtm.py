@@ -3,13 +3,27 @@
 #
 # SPDX-License-Identifier: LicenseRef-LairdConnectivity-Clause
 #
+import codec
 import ctypes
 from enum import Enum
 import logging
-from power_table import POWER_TABLE
+from power_table import (
+    LOGICAL_TO_PHYSICAL,
+    PHYSICAL_TO_LOGICAL,
+    REGION_OFFSETS,
+    VALID_REGION_STRINGS,
+    load_region,
+)
 import math
-import serial
 import time
+from clock import SYSTEM_CLOCK
+from command_stats import CommandStats
+from response_timeout import ResponseTimeout
+from results import TestRecord
+from rx_series import RxSeries
+from sweep import ChannelDwell, SweepMode, SweepReport
+from transport import Transport, open_transport
+from wire_trace import RX, TX, WireTrace
 
 logger = logging.getLogger(__name__)
 
@@ -18,6 +32,8 @@ uint16_t = ctypes.c_uint16
 
 BAUD_RATE = 19200
 SERIAL_TIMEOUT_SECONDS = 1
+BAUD_PROBE_TIMEOUT_SECONDS = 0.05
+BATCH_MAX = 8
 RESPONSE_SIZE = 2
 CHANNEL_MIN = 0
 CHANNEL_MAX = 39
@@ -31,6 +47,32 @@ PACKET_LENGTH_MAX = 255
 NRF5340_SOC_PWR_TABLE = [0, -1, -2, -3, -4, -5, -6, -7, -8, -12, -16, -20, -40]
 """Power levels supported by nRF5340 System on a Chip (SoC)"""
 
+RX_COUNT_HEADROOM = 0.5
+"""Fraction of the 15-bit packet count that a receive interval may use (see :py:meth:`DTM.long_rx_test`)"""
+
+RETRIES = 2
+"""Times an idempotent command is sent again when its response is missing (see :py:attr:`DTM.retries`)"""
+
+RESYNC_ATTEMPTS = 3
+"""Reset probes sent to realign the response stream (see :py:meth:`DTM.resync`)"""
+
+TRACE_SIZE = 256
+"""Number of command and response words kept by :py:attr:`DTM.trace`"""
+
+HIGH_SPEED_BAUD_RATES = [1000000, 921600, 460800, 230400, 115200]
+"""Baud rates that can be probed by firmware builds with a faster UART"""
+
+# Baud rate that worked for each port
+_baud_rate_cache = {}
+
+
+def remember_baud_rate(port: str, baud_rate: int):
+    """
+    Record a baud rate that the firmware on port answered at. It is tried first
+    when the port is opened with probe_baud_rates (see :py:class:`DTM`).
+    """
+    _baud_rate_cache[port] = baud_rate
+
 
 class CommandType(Enum):
     """
@@ -219,32 +261,187 @@ class Response(ctypes.Union):
     ]
 
 
-class DTM:
+def packet_airtime_us(phy: Phy, packet_length: int) -> int:
     """
-    A class to represent Direct Test Mode (DTM) for a Device Under Test (DUT).
+    Estimate the time on air of a test packet in microseconds.
 
-    Currently, only a UART (serial port) transport is supported.
-    All commands are 16 bits in length.
+    Modified from dtm.c in NCS 2.4.1
 
-    Unlike the nRF PC DTM application, the reset command and radio configuration
-    are not sent each time a test is started.
+    Copyright (c) 2020 Nordic Semiconductor ASA
+    SPDX-License-Identifier: LicenseRef-Nordic-5-Clause
+    """
+    # Packet overhead
+    # see BLE [Vol 6, Part F] page 213
+    # 4.1 LE TEST PACKET FORMAT
+    overhead = 0
+    if phy == Phy.PHY_2M:
+        # 16 preamble
+        # 32 sync word
+        #  8 PDU header, actually packetHeaderS0len * 8
+        #  8 PDU length, actually packetHeaderLFlen
+        # 24 CRC
+        overhead = 88  # 11 bytes
+    elif phy == Phy.PHY_1M:
+        #  8 preamble
+        # 32 sync word
+        #  8 PDU header, actually packetHeaderS0len * 8
+        #  8 PDU length, actually packetHeaderLFlen
+        # 24 CRC
+        overhead = 80  # 10 bytes
+    elif phy == Phy.CODED_PHY_S8:
+        # 80     preamble
+        # 32 * 8 sync word coding=8
+        #  2 * 8 Coding indicator, coding=8
+        #  3 * 8 TERM1 coding=8
+        #  8 * 8 PDU header, actually packetHeaderS0len * 8 coding=8
+        #  8 * 8 PDU length, actually packetHeaderLFlen coding=8
+        # 24 * 8 CRC coding=8
+        #  3 * 8 TERM2 coding=8
+        overhead = 720  # 90 bytes
+    elif phy == Phy.CODED_PHY_S2:
+        # 80     preamble
+        # 32 * 8 sync word coding=8
+        #  2 * 8 Coding indicator, coding=8
+        #  3 * 8 TERM 1 coding=8
+        #  8 * 2 PDU header, actually packetHeaderS0len * 8 coding=2
+        #  8 * 2 PDU length, actually packetHeaderLFlen coding=2
+        # 24 * 2 CRC coding=2
+        #  3 * 2 TERM2 coding=2
+        # NOTE: this makes us clock out 46 bits for CI + TERM1 + TERM2
+        #       assumption the radio will handle this
+        overhead = 462  # 57.75 bytes
+
+    # At 1 MBit/s each bit is a microsecond
+    length_us = packet_length * 8
+
+    # Account for the encoding of PDU
+    if phy == Phy.CODED_PHY_S8:
+        length_us *= 8  # 1 to 8 encoding
+    elif phy == Phy.CODED_PHY_S2:
+        length_us *= 2  # 1 to 2 encoding
+
+    length_us += overhead
+
+    # Handle double speed
+    if phy == Phy.PHY_2M:
+        length_us = int(length_us / 2)
+
+    return length_us
+
+
+def packet_interval(length_us: int) -> int:
     """
+    Packet interval in microseconds for a packet of length_us.
 
-    def __init__(self, com_port: str):
-        """
-        Open serial port to device under test.
+    The interval is a multiple of 625 us with at least 249 us between packets.
+    """
+    return int(math.ceil((length_us + 249) / 625) * 625)
 
-        Send the reset command.
 
-        Set the packet length to the maximum (and send vendor specific command).
-        This is done so that RF power measurements are more accurate with inexpensive spectrum
-        analyzers. In addition, most conformance testers use the maximum packet length.
+def packet_interval_us(phy: Phy, packet_length: int) -> int:
+    """
+    Estimate the time per packet in microseconds.
+    """
+    return packet_interval(packet_airtime_us(phy, packet_length))
 
-        :param str com_port: Communication port
-        :raises Exception: if port cannot be opened or
-            reset and packet length commands cannot be sent
+
+SHADOW_REGISTERS = ("tx_power", "phy", "upper_length", "fem_gain", "antenna")
+"""DUT settings that DTM keeps a copy of (see :py:attr:`DTM.commands_saved`)"""
+
+# Indexes of SHADOW_REGISTERS
+SHADOW_TX_POWER = 0
+SHADOW_PHY = 1
+SHADOW_UPPER_LENGTH = 2
+SHADOW_FEM_GAIN = 3
+SHADOW_ANTENNA = 4
+
+SHADOW_WORDS = {}
+"""Command word to the index of the shadow register it sets"""
+for _param in range(COMMAND_FREQ_OR_LEN_MAX + 1):
+    SHADOW_WORDS[codec.vs_word(VendorSpecific.SET_TX_POWER.value, _param)] = (
+        SHADOW_TX_POWER
+    )
+    SHADOW_WORDS[codec.vs_word(VendorSpecific.FEM_GAIN_SET.value, _param)] = (
+        SHADOW_FEM_GAIN
+    )
+    SHADOW_WORDS[codec.vs_word(VendorSpecific.FEM_ANTENNA_SELECT.value, _param)] = (
+        SHADOW_ANTENNA
+    )
+    SHADOW_WORDS[codec.test_setup_word(TestSetup.SET_UPPER.value, _param)] = (
+        SHADOW_UPPER_LENGTH
+    )
+for _phy in Phy:
+    SHADOW_WORDS[codec.test_setup_word(TestSetup.SET_PHY.value, _phy.value, True)] = (
+        SHADOW_PHY
+    )
+
+
+_STATUS_FAILURE_WORD = (ResponseType.STATUS.value << 15) | ResponseStatus.FAILURE.value
+
+
+def _mismatched(cmd: int, word: int) -> bool:
+    """
+    Check if word can't be the response to cmd, which means that a byte has been
+    lost or added and the responses are no longer aligned to words.
+
+    End test is answered by a packet report (or a failed status event if no test
+    is running) and other commands by a status event.
+    """
+    if (cmd >> codec.CMD_SHIFT) == codec.CMD_END:
+        return word < 0x8000 and word != _STATUS_FAILURE_WORD
+    return word >= 0x8000
+
+
+def _is_idempotent(cmd: int) -> bool:
+    """
+    Check if sending cmd twice leaves the DUT in the same state as sending it once
+    (test setup commands and vendor specific commands that don't start a test).
+    """
+    cmd_type = cmd >> codec.CMD_SHIFT
+    if cmd_type == codec.CMD_TEST_SETUP:
+        return True
+    return (
+        cmd_type == codec.CMD_TX
+        and (cmd & 3) == codec.PKT_VS
+        and ((cmd >> codec.LENGTH_SHIFT) & codec.FIELD_MASK)
+        > VendorSpecific.CARRIER_TEST_STUDIO.value
+    )
+
+# The reset command sets the PHY to 1M and the upper bits of the length to 0
+RESET_PHY_WORD = codec.test_setup_word(TestSetup.SET_PHY.value, Phy.PHY_1M.value, True)
+RESET_UPPER_LENGTH_WORD = codec.test_setup_word(TestSetup.SET_UPPER.value, 0)
+
+
+class DTMCore:
+    """
+    State and command encoding shared by :py:class:`DTM` and
+    :py:class:`async_dtm.AsyncDTM`.
+
+    Nothing in this class communicates with the DUT.
+    """
+
+    __slots__ = (
+        "test",
+        "packet_count",
+        "packet_length",
+        "phy",
+        "antenna",
+        "region",
+        "clock",
+        "last_sent",
+        "last_acked",
+        "packet_count_uncertainty",
+        "tx_power",
+        "_power_base",
+        "_power_table",
+    )
+
+    def _init_state(self, clock):
         """
-        self.test = Command(
+        State of the DUT after the reset command and
+        packet length have been sent.
+        """
+        self.test = codec.TestCommand(
             cmd=CommandType.TX.value,
             freq=CHANNEL_MIN,
             length=PACKET_LENGTH_LOWER_MAX,
@@ -255,154 +452,228 @@ class DTM:
         self.phy = Phy.PHY_1M
         self.antenna = Antenna.EXTERNAL
         self.region = Region.UNSET
-        try:
-            self.transport = serial.Serial(
-                com_port, BAUD_RATE, timeout=SERIAL_TIMEOUT_SECONDS
-            )
-            self.reset_cmd()
-            self.set_packet_length(self.packet_length)
-        except:
-            raise Exception("Device communication error")
-
-    def __del__(self):
-        try:
-            self.transport.close()
-            del self.transport
-        except:
-            pass
-
-    def _expect_success(self):
+        self.clock = SYSTEM_CLOCK if clock is None else clock
+        self.last_sent = 0.0
+        """When the last command (or batch) was written (:py:attr:`clock` time)"""
+        self.last_acked = 0.0
+        """When the response to the last command (or batch) was received"""
+        self.packet_count_uncertainty = 0
+        """Possible error (+/-) of the packet count estimated for a transmit test"""
+        self.tx_power = None
+        """Last SoC output power requested (None if it hasn't been set)"""
+        self._update_power_base()
+
+    def _check_success(self, rsp: int):
         """
         An error response often indicates that a command was invalid for the current state
         of the DUT.
+
+        :param int rsp: Decoded response (see :py:func:`codec.decode`)
         """
-        b, rsp = self._read()
-        if len(b) == 0:
+        if rsp == codec.STATUS_SUCCESS:
+            return True
+        elif rsp == codec.NO_RESPONSE:
             raise Exception("Response not received")
-        elif rsp.bits.ev != ResponseType.STATUS.value:
+        elif rsp >= 0:
             logger.error("Response type was not status (it was packet)")
-        elif rsp.status.st != ResponseStatus.SUCCESS.value:
+        else:
             logger.error("Command Failed")
+        return False
 
-    def _expect_packet_count(self):
+    def _check_packet_count(self, rsp: int):
         """
         The test end command should return the number of packets.
+
+        :param int rsp: Decoded response (see :py:func:`codec.decode`)
         """
-        b, rsp = self._read()
-        if len(b) == 0:
-            raise Exception("Response not received")
-        elif rsp.bits.ev == ResponseType.PACKET_REPORT.value:
+        if rsp >= 0:
             # Value isn't valid for transmit test (always 0)
             if self.test.cmd == CommandType.RX.value:
-                logging.info(
-                    f"End Test packet count {rsp.report.packet_count}")
-                self.packet_count = rsp.report.packet_count
+                logging.info("End Test packet count %d", rsp)
+                self.packet_count = rsp
             else:
                 logging.debug("End Test OK")
-        elif rsp.status.st != ResponseStatus.SUCCESS.value:
+            return True
+        elif rsp == codec.NO_RESPONSE:
+            raise Exception("Response not received")
+        elif rsp == codec.STATUS_FAILURE:
             logger.error("End Test Failed")
         else:
             logger.error("Unexpected response for End Test")
+        return False
 
-    def _read(self):
+    def _reset_command(self) -> int:
         """
-        Use transport to read command response from DUT.
+        Reset (test setup) command.
         """
-        b = self.transport.read(RESPONSE_SIZE)
-        rsp = Response(word=int.from_bytes(b, "big"))
-        logging.debug(f"Rx {b.hex()}")
-        return b, rsp
+        return codec.RESET_WORD
 
-    def _send_cmd(self, cmd: Command, expect_packet: bool = False):
+    def _end_command(self) -> int:
         """
-        Use transport to send a message to the DUT.
+        End test command.
         """
-        b = cmd.word.to_bytes(2)
-        logging.debug(f"Tx {b.hex()}")
-        self.transport.write(b)
-        self.packet_count = -1
-        if expect_packet:
-            self._expect_packet_count()
-        else:
-            self._expect_success()
+        return codec.END_WORD
 
-    def reset_cmd(self):
+    def _vs_command(self, sub_cmd: VendorSpecific, param: int) -> int:
         """
-        Send a reset (test setup) command and expect success.
+        Vendor specific command.
 
-        Reset the upper bits of the length and set the PHY to 1M.
+        :param int param: Frequency field is used to send command parameters
         """
-        self._send_cmd(
-            Command(
-                cmd=CommandType.TEST_SETUP.value,
-                freq=TestSetup.RESET.value,
-            )
-        )
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Sending Vendor Specific command: %s", sub_cmd.name)
+        return codec.vs_word(sub_cmd.value, param)
 
-    def end_test(self):
+    def _test_setup_command(self, sub_cmd: TestSetup, param: int):
         """
-        Send an end test command and expect a packet response.
+        Test setup command.
+        (e.g., reset, upper length, PHY, modulation, transmit power)
+
+        :returns: None if the parameter is invalid
         """
-        self._send_cmd(Command(cmd=CommandType.END.value), True)
+        if sub_cmd == TestSetup.SET_PHY:
+            return codec.test_setup_word(sub_cmd.value, param, alt=True)
+        elif param > COMMAND_FREQ_OR_LEN_MAX:
+            logger.error("Parameter too large")
+            return None
 
-    def start_tx_test(self, freq=None, duration=0.0):
+        return codec.test_setup_word(sub_cmd.value, param)
+
+    def _tx_power_command(self, power: int):
         """
-        Start transmit test.
+        Vendor specific command that sets the SoC output power.
 
-        :param freq: If present, frequency in MHz (2402-2480) to use for test
-        :param duration: If greater than 0, the duration of the test in seconds
+        :returns: None if the power isn't supported by the nRF5340
         """
-        logger.debug("Starting TX Test")
-        self.test.cmd = CommandType.TX.value
-        if freq is not None:
-            self.set_frequency(freq)
-        self._adjust_power_for_region_and_antenna()
-        self._send_cmd(self.test)
-        if duration > 0:
-            time.sleep(duration)
-            self.end_test()
-            # Estimate number of packets sent
-            # This doesn't take into account the time to send serial messages or
-            # execution time.
-            self.packet_count = int(
-                (duration * 1e6) / self._packet_interval_us())
-            logging.info(
-                f"Approximately {self.packet_count} packets of "
-                f"{self.packet_length} bytes were sent using {self.phy.name}"
-            )
+        if power in NRF5340_SOC_PWR_TABLE:
+            self.tx_power = power
+            return self._vs_command(VendorSpecific.SET_TX_POWER, power)
+        logger.error("Invalid SoC output power")
+        return None
 
-    def start_tx_sweep(self, duration=1.0, repeat_count: int = 0):
+    def _fem_gain_command(self, gain: int):
         """
-        Transmit on all channels for duration in seconds.
+        Vendor specific command that sets the gain register of the FEM.
 
-        :param duration: time to remain on each channel
-        :param int repeat_count: Number of times to repeat sweep
+        :returns: None if the gain is invalid
         """
-        logger.debug("Starting TX Sweep")
-        self.test.cmd = CommandType.TX.value
-        for _ in range(-1, repeat_count):
-            for channel in range(CHANNEL_MIN, CHANNEL_MAX):
-                self.test.freq = channel
-                self._adjust_power_for_region_and_antenna()
-                self._send_cmd(self.test)
-                time.sleep(duration)
-                self.end_test()
+        if gain < 32 and gain > 0:
+            return self._vs_command(VendorSpecific.FEM_GAIN_SET, gain)
+        logger.error("Invalid FEM gain")
+        return None
 
-    def start_rx_test(self, freq=None, duration=0.0):
+    def _upper_length_command(self, length: int):
         """
-        Start receive test.
+        Split length into two parts.
 
-        :param freq: If present, frequency in MHz (2402-2480) to use for test
-        :param duration: If greater than 0, the duration of the test in seconds
+        The lower part (6 bits) is stored in the test command.
+
+        :returns: Test setup command for the upper 2 bits of the length
+            or None if the length is invalid
         """
-        logger.debug("Starting RX Test")
-        self.test.cmd = CommandType.RX.value
-        if freq is not None:
-            self.set_frequency(freq)
-        self._send_cmd(self.test)
-        if duration > 0:
-            time.sleep(duration)
-            self.end_test()
+        if length > PACKET_LENGTH_MAX:
+            logger.error("Packet length too large")
+            return None
+
+        upper = (length >> 6) & PACKET_LENGTH_UPPER_MAX
+        self.test.length = length & PACKET_LENGTH_LOWER_MAX
+        return self._test_setup_command(TestSetup.SET_UPPER, upper)
+
+    def _region_power(self):
+        """
+        Transmit power required for the region, antenna type, PHY, and channel.
+
+        The current tables don't require floor/ceiling adjustments to map to
+        valid nRF5340 output power levels.
+
+        :returns: None if the region doesn't limit power per channel
+        """
+        if self._power_base < 0:
+            return None
+        return self._power_table[self._power_base + self.test.freq]
+
+    def _update_power_base(self):
+        """
+        Find the start of the power table for the region, antenna type, and PHY.
+        Must be called when any of them change.
+
+        The table for a region is loaded the first time the region is used.
+        """
+        if self.region.name in VALID_REGION_STRINGS:
+            self._power_table = load_region(self.region.name)
+            self._power_base = REGION_OFFSETS[(self.antenna.name, self.phy.name)]
+        else:
+            self._power_table = None
+            self._power_base = -1
+
+    def _select_phy(self, phy: Phy):
+        """
+        Record the PHY that the DUT is using.
+        """
+        self.phy = phy
+        self._update_power_base()
+
+    def _region_power_command(self):
+        """
+        Vendor specific command that sets the transmit power required for the region.
+
+        :returns: None if the region doesn't limit power per channel
+        """
+        power = self._region_power()
+        if power is None:
+            return None
+        return self._tx_power_command(power)
+
+    def _configure_region(self, region: Region, internal_antenna: bool) -> bool:
+        """
+        Select the power tables for region.
+
+        Antenna input of FEM cannot be changed during runtime, but its value
+        must be known to select the correct power table.
+        """
+        if self.region_unset():
+            self.region = region
+            if internal_antenna:
+                self.antenna = Antenna.INTERNAL
+            self._update_power_base()
+            return True
+        return False
+
+    def _estimate_tx_packets(self, started: tuple, ended: tuple):
+        """
+        Estimate number of packets sent during a transmit test.
+
+        The window between the acknowledgements of the start and end test commands
+        is used. The transmitter starts between sending the start command and
+        receiving its acknowledgement (and stops between sending the end command
+        and receiving its acknowledgement), which bounds the error.
+
+        :param tuple started: (sent, acknowledged) times of the start test command
+        :param tuple ended: (sent, acknowledged) times of the end test command
+        """
+        interval = self._packet_interval_us() / 1e6
+        window = ended[1] - started[1]
+        latency = (started[1] - started[0]) + (ended[1] - ended[0])
+        self.packet_count = int(window / interval)
+        self.packet_count_uncertainty = math.ceil(latency / interval) + 1
+        logging.info(
+            "Approximately %d (+/- %d) packets of %d bytes were sent using %s in %.6f s",
+            self.packet_count,
+            self.packet_count_uncertainty,
+            self.packet_length,
+            self.phy.name,
+            window,
+        )
+
+    def _rx_restart_period(self) -> float:
+        """
+        Longest receive test (seconds) that can't overflow the packet count.
+
+        The transmitter's packet length isn't known, so the shortest packet
+        interval for the PHY is used.
+        """
+        interval_us = packet_interval(packet_airtime_us(self.phy, 0))
+        return RX_COUNT_HEADROOM * codec.PACKET_COUNT_MASK * interval_us / 1e6
 
     def set_frequency(self, freq: int):
         """
@@ -427,7 +698,7 @@ class DTM:
             return
         if self.test.freq != channel:
             self.test.freq = channel
-            logger.info(f"Physical channel set to {self.test.freq}")
+            logger.info("Physical channel set to %d", channel)
 
     def set_channel_logical(self, channel: int):
         """
@@ -441,17 +712,10 @@ class DTM:
         ...\n
         2480 = 39\n
         """
-        if channel == 37:
-            c = 0
-        elif channel == 38:
-            c = 12
-        elif channel == 39:
-            c = 39
-        elif channel <= 10:
-            c = channel + 1
-        else:
-            c = channel + 2
-        self.set_channel_physical(c)
+        if channel > CHANNEL_MAX or channel < CHANNEL_MIN:
+            logger.error("Invalid channel")
+            return
+        self.set_channel_physical(LOGICAL_TO_PHYSICAL[channel])
 
     def get_channel_logical(self):
         """
@@ -465,16 +729,936 @@ class DTM:
         ...\n
         2480 = 39\n
         """
-        if self.test.freq == 0:
-            return 37
-        elif self.test.freq == 12:
-            return 38
-        elif self.test.freq == 39:
-            return 39
-        elif self.test.freq <= 11:
-            return self.test.freq - 1
+        return PHYSICAL_TO_LOGICAL[self.test.freq]
+
+    def region_unset(self):
+        """
+        FEM gain is not kept track of by this module.
+        Therefore, it is not possible to change the region without resetting board
+        and creating a new object.
+        """
+        if self.region != Region.UNSET:
+            logging.error("Region already set - reset board to set new region")
+            return False
         else:
-            return self.test.freq - 2
+            return True
+
+    def _packet_interval_us(self):
+        """
+        Estimate the time per packet in microseconds.
+        """
+        length_us = packet_airtime_us(self.phy, self.packet_length)
+        packet_interval_us = packet_interval(length_us)
+        logging.debug("Packet length:   %s microseconds", length_us)
+        logging.debug("Packet interval: %s microseconds", packet_interval_us)
+
+        return packet_interval_us
+
+    def _set_packet_type(self, pt: PacketType):
+        """
+        Set the packet type.
+        """
+        self.test.pkt = pt.value
+
+    def set_packet_type_PRBS9(self):
+        """
+        Set packet type to pseudorandom binary sequence.
+        """
+        self._set_packet_type(PacketType.PRBS9)
+
+    def set_packet_type_11110000(self):
+        """
+        Set packet type to 11110000.
+        """
+        self._set_packet_type(PacketType.B_11110000)
+
+    def set_packet_type_10101010(self):
+        """
+        Set packet type to 10101010.
+        """
+        self._set_packet_type(PacketType.B_10101010)
+
+
+class DTM(DTMCore):
+    """
+    A class to represent Direct Test Mode (DTM) for a Device Under Test (DUT).
+
+    The transport is normally a UART (serial port), but any
+    :py:class:`transport.Transport` can be used (e.g., pty, socket, or loopback).
+    All commands are 16 bits in length.
+
+    Unlike the nRF PC DTM application, the reset command and radio configuration
+    are not sent each time a test is started.
+
+    Commands and responses use preallocated buffers so that sending a command
+    doesn't create any objects that outlive it.
+    """
+
+    __slots__ = (
+        "transport",
+        "name",
+        "sink",
+        "trace",
+        "pipeline",
+        "cache_registers",
+        "retries",
+        "response_timeout",
+        "commands_saved",
+        "_shadow",
+        "_batch_shadow",
+        "_settings",
+        "_resyncs",
+        "_resyncing",
+        "_budget",
+        "_stray",
+        "_tx_buf",
+        "_rx_buf",
+        "_tx_views",
+        "_rx_views",
+        "_record",
+        "_stats",
+    )
+
+    def __init__(
+        self,
+        com_port: str = None,
+        transport: Transport = None,
+        clock=None,
+        baud_rate: int = BAUD_RATE,
+        probe_baud_rates: list = None,
+    ):
+        """
+        Open serial port to device under test.
+
+        Send the reset command.
+
+        Set the packet length to the maximum (and send vendor specific command).
+        This is done so that RF power measurements are more accurate with inexpensive spectrum
+        analyzers. In addition, most conformance testers use the maximum packet length.
+
+        :param str com_port: Communication port or transport URL
+            (see :py:func:`transport.open_transport`)
+        :param transport: If present, an already open transport to use instead of com_port
+        :param clock: If present, clock used to time tests
+            (e.g., :py:class:`clock.VirtualClock` with a simulated DUT)
+        :param int baud_rate: UART baud rate
+        :param list probe_baud_rates: If present, baud rates to try before baud_rate
+            (e.g., :py:data:`HIGH_SPEED_BAUD_RATES`). The first rate that the firmware
+            answers is used and remembered for the port.
+        :raises Exception: if port cannot be opened or
+            reset and packet length commands cannot be sent
+        """
+        self._init_state(clock)
+        self.name = None
+        """Name of the DUT in results (default is the port name)"""
+        self.sink = None
+        """If set, a :py:class:`results.ResultSink` that receives the result of each test"""
+        self._record = None
+        self._stats = CommandStats()
+        self.trace = WireTrace(TRACE_SIZE)
+        """Raw words sent and received (see :py:class:`wire_trace.WireTrace`)"""
+        self.pipeline = True
+        self.cache_registers = True
+        self.retries = RETRIES
+        """Times an idempotent command (e.g., set PHY or transmit power) is sent again
+        when its response is missing"""
+        self.response_timeout = None
+        """:py:class:`response_timeout.ResponseTimeout` that sets the read timeout of
+        the transport from the observed round trip times (None for a fixed timeout)"""
+        self.commands_saved = {name: 0 for name in SHADOW_REGISTERS}
+        self._shadow = [None] * len(SHADOW_REGISTERS)
+        self._batch_shadow = [None] * len(SHADOW_REGISTERS)
+        # Last value set for each shadow register (kept after a failure so that
+        # the settings can be restored after a resync)
+        self._settings = [None] * len(SHADOW_REGISTERS)
+        self._resyncs = 0
+        self._resyncing = False
+        # Time left to wait for responses to the current command or batch,
+        # including retries (see _expired)
+        self._budget = 0.0
+        # Responses to earlier attempts that may still arrive (see _drain)
+        self._stray = 0
+        self._tx_buf = bytearray(BATCH_MAX * 2)
+        self._rx_buf = bytearray(BATCH_MAX * RESPONSE_SIZE)
+        # A view of the first n words of each buffer
+        tx = memoryview(self._tx_buf)
+        rx = memoryview(self._rx_buf)
+        self._tx_views = [tx[: n * 2] for n in range(BATCH_MAX + 1)]
+        self._rx_views = [rx[: n * RESPONSE_SIZE] for n in range(BATCH_MAX + 1)]
+        try:
+            if transport is None:
+                transport = open_transport(
+                    com_port, baud_rate, SERIAL_TIMEOUT_SECONDS)
+            self.transport = transport
+            self.name = transport.name
+            if probe_baud_rates:
+                self._negotiate_baud_rate(probe_baud_rates, baud_rate)
+            if transport.timeout:
+                self.response_timeout = ResponseTimeout(ceiling=transport.timeout)
+                self.response_timeout.set_baud_rate(transport.baudrate)
+            self.send_batch(
+                [
+                    self._reset_command(),
+                    self._upper_length_command(self.packet_length),
+                ]
+            )
+        except:
+            raise Exception("Device communication error")
+
+    def __del__(self):
+        try:
+            self.transport.close()
+            del self.transport
+        except:
+            pass
+
+    def _probe(self) -> bool:
+        """
+        Check that the firmware answers two reset commands.
+
+        At the wrong baud rate the response is usually missing or garbled, so
+        the response must be exactly two successful status events.
+        """
+        self.transport.reset_input_buffer()
+        b = self._reset_command().to_bytes(2)
+        self.transport.write(b + b)
+        return self.transport.read_exact(2 * RESPONSE_SIZE + 1) == bytes(4)
+
+    def _negotiate_baud_rate(self, rates: list, fallback: int):
+        """
+        Use the first baud rate that the firmware answers.
+
+        The rate that worked last time for the port is tried first.
+        If none work, fallback is used.
+        """
+        name = self.transport.name
+        candidates = [_baud_rate_cache.get(name)] + list(rates) + [fallback]
+        timeout = self.transport.timeout
+        self.transport.timeout = BAUD_PROBE_TIMEOUT_SECONDS
+        try:
+            for rate in dict.fromkeys(candidates):
+                if rate is None:
+                    continue
+                self.transport.baudrate = rate
+                if self._probe():
+                    logger.info("%s baud rate %d", name, rate)
+                    remember_baud_rate(name, rate)
+                    return
+            self.transport.baudrate = fallback
+            logger.warning("%s didn't respond to baud rate probe", name)
+        finally:
+            self.transport.timeout = timeout
+
+    def _invalidate_shadow(self):
+        """
+        Forget the state of the DUT (e.g., after a failure).
+        """
+        shadow = self._shadow
+        for i in range(len(shadow)):
+            shadow[i] = None
+
+    def _suppress(self, cmd: int, shadow: list = None) -> bool:
+        """
+        Check if cmd would set a register of the DUT to the value it already has.
+
+        :param list shadow: If present, registers to check instead of the shadow
+            (the state after the earlier commands of a batch)
+        """
+        if shadow is None:
+            shadow = self._shadow
+        register = SHADOW_WORDS.get(cmd, -1)
+        if register >= 0 and self.cache_registers and shadow[register] == cmd:
+            self.commands_saved[SHADOW_REGISTERS[register]] += 1
+            return True
+        return False
+
+    def _complete(self, cmd: int, rsp: int, expect_packet: bool):
+        """
+        Check the response to cmd and update the shadow registers.
+        """
+        latency = self.last_acked - self.last_sent
+        if rsp == codec.NO_RESPONSE:
+            self._invalidate_shadow()
+            self._stats.record(cmd, latency, False, True)
+            logger.error("%s wire trace:\n%s", self.name, self.trace.format())
+        if expect_packet:
+            ok = self._check_packet_count(rsp)
+        else:
+            ok = self._check_success(rsp)
+        self._stats.record(cmd, latency, ok, False)
+        if not ok:
+            self._invalidate_shadow()
+        elif cmd == codec.RESET_WORD:
+            self._reset_shadow()
+            self._settings[SHADOW_PHY] = RESET_PHY_WORD
+            self._settings[SHADOW_UPPER_LENGTH] = RESET_UPPER_LENGTH_WORD
+        else:
+            register = SHADOW_WORDS.get(cmd, -1)
+            if register >= 0:
+                self._shadow[register] = cmd
+                self._settings[register] = cmd
+
+    def _reset_shadow(self):
+        """
+        The DUT has been reset (PHY is 1M and the upper bits of the length are 0).
+        """
+        self._invalidate_shadow()
+        self._shadow[SHADOW_PHY] = RESET_PHY_WORD
+        self._shadow[SHADOW_UPPER_LENGTH] = RESET_UPPER_LENGTH_WORD
+
+    def resync(self) -> bool:
+        """
+        Realign the response stream after a byte was lost or added
+        (e.g., a USB-serial glitch or a DUT reboot message).
+
+        Received data is discarded and reset commands are sent until the firmware
+        answers exactly two of them (see :py:data:`RESYNC_ATTEMPTS`). The settings
+        sent before the loss (transmit power, PHY, packet length, FEM gain, and
+        antenna) are then sent again. A running test is ended by the reset.
+
+        This is called automatically when a response doesn't match its command.
+
+        :returns: False if the firmware didn't answer
+        """
+        if self._resyncing:
+            return False
+        self._resyncing = True
+        self._resyncs += 1
+        logger.warning("%s response stream out of sync, realigning", self.name)
+        timeout = self.transport.timeout
+        self.transport.timeout = BAUD_PROBE_TIMEOUT_SECONDS
+        try:
+            for _ in range(RESYNC_ATTEMPTS):
+                if self._probe():
+                    break
+            else:
+                self._invalidate_shadow()
+                logger.error("%s didn't answer reset after losing sync", self.name)
+                return False
+            self.transport.timeout = timeout
+            self._reset_shadow()
+            self.packet_count = -1
+            self._record = None
+            self.send_batch(list(self._settings))
+            return True
+        finally:
+            self.transport.timeout = timeout
+            self._resyncing = False
+
+    def _lost_sync(self, cmd: int, latency: float, resend: list = None):
+        """
+        Realign after the response to cmd didn't match it (see :py:meth:`resync`).
+
+        :param list resend: If present and all of the commands are idempotent,
+            commands to send again one at a time (e.g., the rest of a batch)
+        :raises Exception: if the commands aren't sent again
+        """
+        self._restore_timeout()
+        self._stats.record(cmd, latency, False, False)
+        if (
+            self.resync()
+            and resend
+            and self.retries > 0
+            and all(_is_idempotent(c) for c in resend)
+        ):
+            self._stats.retry(cmd)
+            for c in resend:
+                self._send_cmd(c)
+            return
+        raise Exception("Response out of sync")
+
+    def _observe(self, latency: float):
+        """
+        Update the read timeout with a round trip time.
+        """
+        rt = self.response_timeout
+        if rt is not None and rt.observe(latency, BATCH_MAX if self.pipeline else 1):
+            self.transport.timeout = rt.value
+
+    def _start_budget(self):
+        """
+        Start waiting for the responses to a command or batch. All attempts share
+        one budget, the ceiling of :py:attr:`response_timeout`.
+        """
+        rt = self.response_timeout
+        if rt is not None:
+            self._budget = rt.ceiling
+            self._stray = 0
+
+    def _attempt_timeout(self):
+        """
+        Set the read timeout of another attempt: the adaptive timeout, limited
+        to the rest of the budget (but at least the floor).
+        """
+        rt = self.response_timeout
+        if rt is not None:
+            timeout = max(min(rt.value, self._budget), rt.floor)
+            if self.transport.timeout != timeout:
+                self.transport.timeout = timeout
+
+    def _restore_timeout(self):
+        rt = self.response_timeout
+        if rt is not None and self.transport.timeout != rt.value:
+            self.transport.timeout = rt.value
+
+    def _expired(self, retry: bool) -> bool:
+        """
+        The read timeout expired before a response was complete.
+
+        The time waited is taken from the budget and the adaptive timeout is
+        increased.
+
+        :param bool retry: The commands without a response can be sent again
+        :returns: True if they should be sent again (the budget has time
+            for another attempt)
+        """
+        rt = self.response_timeout
+        if rt is None:
+            return retry
+        self._budget -= self.transport.timeout
+        rt.expired()
+        if not retry or self._budget < rt.floor:
+            return False
+        self._attempt_timeout()
+        return True
+
+    def _read_late(self, view, n: int) -> int:
+        """
+        Keep reading a response that is still missing after the last attempt,
+        for the rest of the budget.
+
+        A response that arrives late is used; otherwise it would be read as the
+        response to the next command.
+
+        :param view: Response buffer
+        :param int n: Number of bytes already read
+        :returns: Number of bytes read
+        """
+        rt = self.response_timeout
+        if rt is None:
+            return n
+        budget = self._budget
+        self._budget = 0.0
+        if budget > 0:
+            transport = self.transport
+            transport.timeout = budget
+            try:
+                n += transport.readinto(view[n:])
+            finally:
+                transport.timeout = rt.value
+            if n == len(view):
+                rt.late += 1
+                logger.warning("%s late response", self.name)
+        else:
+            self._restore_timeout()
+        return n
+
+    def _drain(self):
+        """
+        Discard the responses to attempts that were sent again, which may still
+        arrive, waiting at most the rest of the budget.
+        """
+        rt = self.response_timeout
+        count = min(self._stray, BATCH_MAX)
+        self._stray = 0
+        if rt is None or self._budget <= 0:
+            return
+        rx = self._rx_views[count]
+        transport = self.transport
+        transport.timeout = self._budget
+        try:
+            n = transport.readinto(rx)
+        finally:
+            transport.timeout = rt.value
+        self._budget = 0.0
+        if n:
+            rt.late += n // RESPONSE_SIZE
+            logger.warning("%s late response to an earlier attempt discarded", self.name)
+
+    def _retry(self, cmd: int, latency: float):
+        """
+        Prepare to send cmd again after its response wasn't received.
+
+        Data received so far is discarded. The response to the earlier attempt
+        is discarded if it arrives later (see :py:meth:`_drain`).
+        """
+        self._stats.record(cmd, latency, False, True)
+        self._stats.retry(cmd)
+        logger.warning("%s no response to %04x, sending it again", self.name, cmd)
+        self.transport.reset_input_buffer()
+
+    def _read(self) -> int:
+        """
+        Use transport to read command response from DUT.
+
+        The response is read into a preallocated buffer.
+
+        :returns: Response word, -1 if a response wasn't received, or -2 if only
+            part of a response was received
+        """
+        rx = self._rx_views[1]
+        n = self.transport.readinto(rx)
+        if n != RESPONSE_SIZE:
+            return -1 if n == 0 else -2
+        return (rx[0] << 8) | rx[1]
+
+    def _send_cmd(self, cmd: int, expect_packet: bool = False, resend: bool = False):
+        """
+        Use transport to send a message (16-bit command word) to the DUT.
+
+        Setup and vendor specific commands that wouldn't change the state of the DUT
+        aren't sent (see :py:attr:`cache_registers`).
+        Idempotent commands are sent again if the response is missing
+        (see :py:attr:`retries`). If the response doesn't match the command,
+        the response stream is realigned (see :py:meth:`resync`).
+
+        :param bool resend: The command is sent again after a batch didn't get
+            a response (the budget of the batch is used)
+        """
+        if self._suppress(cmd):
+            return
+        if resend:
+            self._attempt_timeout()
+        else:
+            self._start_budget()
+        tx = self._tx_buf
+        clock = self.clock
+        trace = self.trace
+        attempts = 0
+        rsp = None
+        while True:
+            # A resync uses the buffer
+            tx[0] = cmd >> 8
+            tx[1] = cmd & 0xFF
+            self.last_sent = sent = clock.now()
+            self.transport.write(self._tx_views[1])
+            self.packet_count = -1
+            word = self._read()
+            if word < 0:
+                retry = word == -1 and attempts < self.retries and _is_idempotent(cmd)
+                if self._expired(retry):
+                    self.last_acked = acked = clock.now()
+                    trace.add(sent, TX, cmd)
+                    trace.add(acked, RX, -1)
+                    attempts += 1
+                    self._stray += 1
+                    self._retry(cmd, acked - sent)
+                    continue
+                rx = self._rx_views[1]
+                n = self._read_late(rx, 0 if word == -1 else 1)
+                if n == RESPONSE_SIZE:
+                    word = (rx[0] << 8) | rx[1]
+            self.last_acked = acked = clock.now()
+            trace.add(sent, TX, cmd)
+            trace.add(acked, RX, word)
+            if word >= 0:
+                self._observe(acked - sent)
+                if not _mismatched(cmd, word):
+                    rsp = codec.RESPONSES[word]
+                    break
+            if word == -1 or attempts >= self.retries or not _is_idempotent(cmd):
+                break
+            attempts += 1
+            self._stats.record(cmd, acked - sent, False, False)
+            self._stats.retry(cmd)
+            if not self.resync():
+                break
+        if attempts or resend:
+            self._restore_timeout()
+        if self._stray and not resend:
+            self._drain()
+        if logging.root.isEnabledFor(logging.DEBUG):
+            logging.debug(
+                "Tx %04x Rx %s", cmd, format(word, "04x") if word >= 0 else "----"
+            )
+        if rsp is None:
+            if word != -1:
+                self._lost_sync(cmd, acked - sent)
+                return
+            rsp = codec.NO_RESPONSE
+        self._complete(cmd, rsp, expect_packet)
+
+    def send_batch(self, cmds: list):
+        """
+        Send commands back-to-back and then read all of the responses at once.
+
+        Each response is checked in order. End test commands expect a packet report;
+        all other commands expect a successful status.
+        If responses are missing and the commands without a response are all
+        idempotent, they are sent again one at a time (see :py:attr:`retries`).
+        If :py:attr:`pipeline` is False (or there are more than :py:data:`BATCH_MAX`
+        commands), commands are sent one at a time.
+
+        :param list cmds: Command words to send (None entries are skipped)
+        """
+        kept = []
+        # Registers as the commands kept so far leave them (the shadow is only
+        # changed when the responses are checked)
+        shadow = self._batch_shadow
+        shadow[:] = self._shadow
+        for cmd in cmds:
+            if cmd is None:
+                continue
+            elif cmd == codec.RESET_WORD:
+                for i in range(len(shadow)):
+                    shadow[i] = None
+                shadow[SHADOW_PHY] = RESET_PHY_WORD
+                shadow[SHADOW_UPPER_LENGTH] = RESET_UPPER_LENGTH_WORD
+            elif self._suppress(cmd, shadow):
+                continue
+            else:
+                register = SHADOW_WORDS.get(cmd, -1)
+                if register >= 0:
+                    shadow[register] = cmd
+            kept.append(cmd)
+        cmds = kept
+        count = len(cmds)
+        if count == 0:
+            return
+        elif not self.pipeline or count > BATCH_MAX:
+            for cmd in cmds:
+                self._send_cmd(cmd, (cmd >> codec.CMD_SHIFT) == codec.CMD_END)
+            return
+
+        tx = self._tx_buf
+        for i in range(count):
+            tx[2 * i] = cmds[i] >> 8
+            tx[2 * i + 1] = cmds[i] & 0xFF
+        clock = self.clock
+        trace = self.trace
+        self._start_budget()
+        self.last_sent = sent = clock.now()
+        self.transport.write(self._tx_views[count])
+        self.packet_count = -1
+        rx = self._rx_views[count]
+        n = self.transport.readinto(rx)
+        resend = False
+        if n != count * RESPONSE_SIZE:
+            # Whole responses are missing: send those commands again if they are
+            # idempotent and the budget allows it, otherwise wait for them
+            missing = cmds[n // RESPONSE_SIZE :]
+            resend = self._expired(
+                n % RESPONSE_SIZE == 0
+                and self.retries > 0
+                and all(_is_idempotent(cmd) for cmd in missing)
+            )
+            if not resend:
+                n = self._read_late(rx, n)
+        self.last_acked = acked = clock.now()
+        if logging.root.isEnabledFor(logging.DEBUG):
+            logging.debug(
+                "Tx %s Rx %s", self._tx_views[count].hex(), rx[:n].hex())
+        for i in range(count):
+            trace.add(sent, TX, cmds[i])
+        if n == count * RESPONSE_SIZE:
+            self._observe(acked - sent)
+        for i in range(count):
+            cmd = cmds[i]
+            if n >= 2 * i + RESPONSE_SIZE:
+                word = (rx[2 * i] << 8) | rx[2 * i + 1]
+                trace.add(acked, RX, word)
+                if _mismatched(cmd, word):
+                    self._lost_sync(cmd, acked - sent, cmds[i:])
+                    return
+                rsp = codec.RESPONSES[word]
+            elif n > 2 * i:
+                # Odd number of bytes
+                trace.add(acked, RX, -1)
+                self._lost_sync(cmd, acked - sent, cmds[i:])
+                return
+            elif resend:
+                self._resend(cmds[i:], acked - sent)
+                return
+            else:
+                trace.add(acked, RX, -1)
+                rsp = codec.NO_RESPONSE
+            self._complete(cmd, rsp, (cmd >> codec.CMD_SHIFT) == codec.CMD_END)
+
+    def _resend(self, cmds: list, latency: float):
+        """
+        Send the commands of a batch that didn't get a response one at a time,
+        within the rest of the budget of the batch.
+        """
+        for _ in cmds:
+            self.trace.add(self.last_acked, RX, -1)
+        self._stray += len(cmds)
+        self._retry(cmds[0], latency)
+        for cmd in cmds:
+            self._send_cmd(cmd, resend=True)
+        self._restore_timeout()
+        if self._stray:
+            self._drain()
+
+    def stats(self) -> dict:
+        """
+        Counters and latency histogram of each kind of command sent since the
+        DTM was created (or :py:meth:`reset_stats`).
+
+        :returns: command kind (e.g., "TX", "END", "VS_SET_TX_POWER") to
+            count, failures, timeouts, mean_us, max_us, and histogram.
+            "total" has the counts for all commands, "suppressed" the commands
+            that weren't sent (see :py:attr:`commands_saved`), "resyncs" the number
+            of times the response stream was realigned (see :py:meth:`resync`),
+            and "response_timeout" the state of :py:attr:`response_timeout`.
+        """
+        result = self._stats.snapshot()
+        result["suppressed"] = dict(self.commands_saved)
+        result["resyncs"] = self._resyncs
+        if self.response_timeout is not None:
+            result["response_timeout"] = self.response_timeout.snapshot()
+        return result
+
+    def reset_stats(self):
+        """
+        Clear the counters returned by :py:meth:`stats`.
+        """
+        self._stats.reset()
+        self._resyncs = 0
+        for name in self.commands_saved:
+            self.commands_saved[name] = 0
+
+    def reset_cmd(self):
+        """
+        Send a reset (test setup) command and expect success.
+
+        Reset the upper bits of the length and set the PHY to 1M.
+        """
+        self._send_cmd(self._reset_command())
+
+    def end_test(self):
+        """
+        Send an end test command and expect a packet response.
+
+        If :py:attr:`sink` is set, the result of the test is emitted.
+        """
+        self._end()
+        record = self._record
+        if record is not None:
+            count = self.packet_count if record.test == "RX" else None
+            self._finish_record(record, count)
+            self._record = None
+
+    def _end(self):
+        self._send_cmd(self._end_command(), True)
+
+    def _new_record(self, test: str):
+        """
+        Start the result of a test (called after the start command is acknowledged).
+
+        :returns: None if there isn't a :py:attr:`sink`
+        """
+        if self.sink is None:
+            return None
+        return TestRecord(
+            dut=self.name,
+            port=self.transport.name,
+            test=test,
+            channel=self.test.freq,
+            phy=self.phy.name,
+            packet_length=self.packet_length,
+            packet_type=PacketType(self.test.pkt).name,
+            power=self.tx_power,
+            region=self.region.name,
+            start=self.last_acked,
+        )
+
+    def _finish_record(self, record: TestRecord, packet_count, uncertainty=None):
+        """
+        Complete the result of a test (called after the end test command) and emit it.
+        """
+        if record is None:
+            return
+        record.time = time.time()
+        record.end = self.last_sent
+        if packet_count is not None and packet_count >= 0:
+            record.packet_count = packet_count
+            record.uncertainty = uncertainty
+        self.sink.emit(record)
+
+    def start_tx_test(self, freq=None, duration=0.0):
+        """
+        Start transmit test.
+
+        :param freq: If present, frequency in MHz (2402-2480) to use for test
+        :param duration: If greater than 0, the duration of the test in seconds.
+            :py:attr:`packet_count` is estimated from the time between the
+            acknowledgements of the start and end test commands
+            (see :py:attr:`packet_count_uncertainty`).
+        """
+        logger.debug("Starting TX Test")
+        self.test.cmd = CommandType.TX.value
+        if freq is not None:
+            self.set_frequency(freq)
+        self.send_batch([self._region_power_command(), self.test.word])
+        started = (self.last_sent, self.last_acked)
+        self._record = self._new_record("TX")
+        if duration > 0:
+            self.clock.sleep(duration)
+            self._end()
+            self._estimate_tx_packets(started, (self.last_sent, self.last_acked))
+            self._finish_record(
+                self._record, self.packet_count, self.packet_count_uncertainty
+            )
+            self._record = None
+
+    def start_tx_sweep(self, duration=1.0, repeat_count: int = 0):
+        """
+        Transmit on all channels for duration in seconds.
+
+        :param duration: time to remain on each channel
+        :param int repeat_count: Number of times to repeat sweep
+        :returns: timing of each channel (see :py:meth:`sweep`)
+        """
+        return self.sweep(SweepMode.TX, dwell=duration, repeat_count=repeat_count)
+
+    def sweep(
+        self,
+        mode: SweepMode = SweepMode.TX,
+        channels: list = None,
+        dwell: float = 1.0,
+        repeat_count: int = 0,
+    ) -> SweepReport:
+        """
+        Run a test on each channel, changing channel at fixed times.
+
+        Channel changes are scheduled at absolute deadlines (start + n * dwell), so
+        the time taken by commands doesn't accumulate. The end of the test on one
+        channel, the power for the next channel, and the start of the next test
+        are sent as one batch.
+
+        :param SweepMode mode: Test to run on each channel
+        :param list channels: Physical channels in the order they are visited
+            (default is all channels in order)
+        :param dwell: time to remain on each channel in seconds
+        :param int repeat_count: Number of times to repeat sweep
+        :returns: timing (and packet counts for receive) of each channel or
+            None if a channel is invalid
+        """
+        if channels is None:
+            channels = range(CHANNEL_MIN, CHANNEL_MAX + 1)
+        for channel in channels:
+            if channel > CHANNEL_MAX or channel < CHANNEL_MIN:
+                logger.error("Invalid channel")
+                return None
+
+        logger.debug("Starting %s Sweep", mode.name)
+        report = SweepReport(mode, dwell)
+        if mode == SweepMode.RX:
+            self.test.cmd = CommandType.RX.value
+        else:
+            self.test.cmd = CommandType.TX.value
+        clock = self.clock
+        first = clock.now()
+        end = None
+        step = None
+        record = None
+        n = 0
+        for _ in range(-1, repeat_count):
+            for channel in channels:
+                deadline = first + n * dwell
+                clock.sleep(deadline - clock.now())
+                self.test.freq = channel
+                power = None
+                if mode == SweepMode.CARRIER:
+                    start = self._vs_command(VendorSpecific.CARRIER_TEST, channel)
+                else:
+                    start = self.test.word
+                    if mode == SweepMode.TX:
+                        power = self._region_power_command()
+                self.send_batch([end, power, start])
+                if step is not None:
+                    self._end_dwell(step, self.last_sent)
+                    self._finish_record(record, step.packet_count)
+                step = ChannelDwell(channel, deadline, self.last_sent, self.last_acked)
+                record = self._new_record(mode.name)
+                report.steps.append(step)
+                end = self._end_command()
+                n += 1
+
+        if step is not None:
+            clock.sleep(first + n * dwell - clock.now())
+            self._end()
+            self._end_dwell(step, self.last_sent)
+            self._finish_record(record, step.packet_count)
+        return report
+
+    def _end_dwell(self, step: ChannelDwell, sent: float):
+        """
+        Record the end of a channel of a sweep (after the end test response is received).
+        """
+        step.end = sent
+        if self.test.cmd == CommandType.RX.value:
+            step.packet_count = self.packet_count
+
+    def start_rx_test(self, freq=None, duration=0.0):
+        """
+        Start receive test.
+
+        :param freq: If present, frequency in MHz (2402-2480) to use for test
+        :param duration: If greater than 0, the duration of the test in seconds
+        """
+        logger.debug("Starting RX Test")
+        self.test.cmd = CommandType.RX.value
+        if freq is not None:
+            self.set_frequency(freq)
+        self._send_cmd(self.test.word)
+        self._record = self._new_record("RX")
+        if duration > 0:
+            self.clock.sleep(duration)
+            self.end_test()
+
+    def long_rx_test(
+        self, freq=None, duration: float = 60.0, restart_interval: float = None
+    ) -> RxSeries:
+        """
+        Receive test that is longer than the 15-bit packet count allows.
+
+        The test is ended and restarted (in one batch) at fixed times, before
+        the packet count can overflow. The count of each interval is kept.
+
+        :param freq: If present, frequency in MHz (2402-2480) to use for test
+        :param duration: Length of the test in seconds
+        :param restart_interval: If present, time between restarts in seconds.
+            It is limited to the longest interval that can't overflow.
+        :returns: packet counts of each interval
+        """
+        self.test.cmd = CommandType.RX.value
+        if freq is not None:
+            self.set_frequency(freq)
+        period = self._rx_restart_period()
+        if restart_interval is not None:
+            if restart_interval > period:
+                logger.warning("Restart interval limited to %.3f s", period)
+            else:
+                period = restart_interval
+
+        series = RxSeries(self.test.freq, self.phy, period)
+        clock = self.clock
+        start_cmd = self.test.word
+        end_cmd = self._end_command()
+        self._send_cmd(start_cmd)
+        record = self._new_record("RX")
+        first = start = self.last_acked
+        finish = first + duration
+        n = 1
+        while True:
+            deadline = min(first + n * period, finish)
+            clock.sleep(deadline - clock.now())
+            if deadline >= finish:
+                self._end()
+                series.append(start, self.last_sent, self.packet_count)
+                self._finish_record(record, self.packet_count)
+                break
+            self.send_batch([end_cmd, start_cmd])
+            series.append(start, self.last_sent, self.packet_count)
+            self._finish_record(record, self.packet_count)
+            record = self._new_record("RX")
+            start = self.last_acked
+            n += 1
+        logger.info(
+            "Received %d packets in %d intervals", series.total, len(series)
+        )
+        return series
 
     def _send_vs_cmd(self, sub_cmd: VendorSpecific, param: int):
         """
@@ -482,14 +1666,7 @@ class DTM:
 
         :param int param: Frequency field is used to send command parameters
         """
-        logger.debug(f"Sending Vendor Specific command: {sub_cmd.name}")
-        vendor_specific = Command(
-            cmd=CommandType.TX.value,
-            freq=param,
-            length=sub_cmd.value,
-            pkt=PacketType.VS.value,
-        )
-        self._send_cmd(vendor_specific)
+        self._send_cmd(self._vs_command(sub_cmd, param))
 
     def tx_constant_carrier(self, freq=None, duration=0.0):
         """
@@ -501,8 +1678,9 @@ class DTM:
         if freq is not None:
             self.set_frequency(freq)
         self._send_vs_cmd(VendorSpecific.CARRIER_TEST, self.test.freq)
+        self._record = self._new_record("CARRIER")
         if duration > 0:
-            time.sleep(duration)
+            self.clock.sleep(duration)
             self.end_test()
 
     def set_tx_power(self, power: int):
@@ -520,10 +1698,9 @@ class DTM:
             logging.error("Power cannot be set manually when a region is set")
 
     def _set_tx_power(self, power: int):
-        if power in NRF5340_SOC_PWR_TABLE:
-            self._send_vs_cmd(VendorSpecific.SET_TX_POWER, power)
-        else:
-            logger.error("Invalid SoC output power")
+        cmd = self._tx_power_command(power)
+        if cmd is not None:
+            self._send_cmd(cmd)
 
     def _antenna_select(self, ant: int):
         """
@@ -547,22 +1724,9 @@ class DTM:
 
         :param int gain: Value of gain register in nRF21540 (0-31)
         """
-        if gain < 32 and gain > 0:
-            self._send_vs_cmd(VendorSpecific.FEM_GAIN_SET, gain)
-        else:
-            logger.error("Invalid FEM gain")
-
-    def region_unset(self):
-        """
-        FEM gain is not kept track of by this module.
-        Therefore, it is not possible to change the region without resetting board
-        and creating a new object.
-        """
-        if self.region != Region.UNSET:
-            logging.error("Region already set - reset board to set new region")
-            return False
-        else:
-            return True
+        cmd = self._fem_gain_command(gain)
+        if cmd is not None:
+            self._send_cmd(cmd)
 
     def configure_for_ce(self):
         """
@@ -571,9 +1735,10 @@ class DTM:
         """
         if self.region_unset():
             self.region = Region.CE
-            self._set_tx_power(-16)
+            self._update_power_base()
             # Gain of ~18 dB
-            self.set_fem_gain(23)
+            self.send_batch(
+                [self._tx_power_command(-16), self._fem_gain_command(23)])
 
     def configure_for_north_america(self, internal_antenna: bool = False):
         """
@@ -582,10 +1747,7 @@ class DTM:
         Antenna input of FEM cannot be changed during runtime, but its value
         must be known to select the correct power table.
         """
-        if self.region_unset():
-            self.region = Region.FCC_IC
-            if internal_antenna:
-                self.antenna = Antenna.INTERNAL
+        self._configure_region(Region.FCC_IC, internal_antenna)
 
     def configure_for_australia_nz(self, internal_antenna: bool = False):
         """
@@ -594,49 +1756,28 @@ class DTM:
         Antenna input of FEM cannot be changed during runtime, but its value
         must be known to select the correct power table.
         """
-        if self.region_unset():
-            self.region = Region.RCM
-            if internal_antenna:
-                self.antenna = Antenna.INTERNAL
+        self._configure_region(Region.RCM, internal_antenna)
 
     def _adjust_power_for_region_and_antenna(self):
         """
         If required, adjust the transmit power for the region and antenna type.
-
-        The current tables don't require floor/ceiling adjustments to map to
-        valid nRF5340 output power levels.
         """
-        if self.region == Region.FCC_IC or self.region == Region.RCM:
-            self._set_tx_power(
-                POWER_TABLE[self.region.name][self.antenna.name][self.phy.name][
-                    self.get_channel_logical()
-                ]
-            )
+        self.send_batch([self._region_power_command()])
 
     def _send_test_setup_cmd(self, sub_cmd: TestSetup, param: int):
         """
         Send a test setup command.
         (e.g., reset, upper length, PHY, modulation, transmit power)
         """
-        ts = Command(
-            cmd=CommandType.TEST_SETUP.value,
-            freq=sub_cmd.value,
-            length=param,
-            pkt=0,
-        )
-        if sub_cmd == TestSetup.SET_PHY:
-            ts.alt.param = param
-        elif param > COMMAND_FREQ_OR_LEN_MAX:
-            logger.error("Parameter too large")
-            return
-
-        self._send_cmd(ts)
+        ts = self._test_setup_command(sub_cmd, param)
+        if ts is not None:
+            self._send_cmd(ts)
 
     def _set_phy(self, param: Phy):
         """
         Set the PHY.
         """
-        self.phy = param
+        self._select_phy(param)
         self._send_test_setup_cmd(TestSetup.SET_PHY, param.value)
 
     def set_phy_1M(self):
@@ -674,109 +1815,10 @@ class DTM:
 
         :param int length: The length of the packet (0-255)
         """
-        if length > PACKET_LENGTH_MAX:
-            logger.error("Packet length too large")
-            return
-
-        upper = (length >> 6) & PACKET_LENGTH_UPPER_MAX
-        self.test.length = lower = length & PACKET_LENGTH_LOWER_MAX
-        self._send_test_setup_cmd(TestSetup.SET_UPPER, upper)
-        self.packet_length = length
-
-    def _packet_interval_us(self):
-        """
-        Estimate the time per packet in microseconds.
-
-        Modified from dtm.c in NCS 2.4.1
-
-        Copyright (c) 2020 Nordic Semiconductor ASA
-        SPDX-License-Identifier: LicenseRef-Nordic-5-Clause
-        """
-        # Packet overhead
-        # see BLE [Vol 6, Part F] page 213
-        # 4.1 LE TEST PACKET FORMAT
-        overhead = 0
-        if self.phy == Phy.PHY_2M:
-            # 16 preamble
-            # 32 sync word
-            #  8 PDU header, actually packetHeaderS0len * 8
-            #  8 PDU length, actually packetHeaderLFlen
-            # 24 CRC
-            overhead = 88  # 11 bytes
-        elif self.phy == Phy.PHY_1M:
-            #  8 preamble
-            # 32 sync word
-            #  8 PDU header, actually packetHeaderS0len * 8
-            #  8 PDU length, actually packetHeaderLFlen
-            # 24 CRC
-            overhead = 80  # 10 bytes
-        elif self.phy == Phy.CODED_PHY_S8:
-            # 80     preamble
-            # 32 * 8 sync word coding=8
-            #  2 * 8 Coding indicator, coding=8
-            #  3 * 8 TERM1 coding=8
-            #  8 * 8 PDU header, actually packetHeaderS0len * 8 coding=8
-            #  8 * 8 PDU length, actually packetHeaderLFlen coding=8
-            # 24 * 8 CRC coding=8
-            #  3 * 8 TERM2 coding=8
-            overhead = 720  # 90 bytes
-        elif self.phy == Phy.CODED_PHY_S2:
-            # 80     preamble
-            # 32 * 8 sync word coding=8
-            #  2 * 8 Coding indicator, coding=8
-            #  3 * 8 TERM 1 coding=8
-            #  8 * 2 PDU header, actually packetHeaderS0len * 8 coding=2
-            #  8 * 2 PDU length, actually packetHeaderLFlen coding=2
-            # 24 * 2 CRC coding=2
-            #  3 * 2 TERM2 coding=2
-            # NOTE: this makes us clock out 46 bits for CI + TERM1 + TERM2
-            #       assumption the radio will handle this
-            overhead = 462  # 57.75 bytes
-
-        # At 1 MBit/s each bit is a microsecond
-        length_us = self.packet_length * 8
-
-        # Account for the encoding of PDU
-        if self.phy == Phy.CODED_PHY_S8:
-            length_us *= 8  # 1 to 8 encoding
-        elif self.phy == Phy.CODED_PHY_S2:
-            length_us *= 2  # 1 to 2 encoding
-
-        length_us += overhead
-
-        # Handle double speed
-        if self.phy == Phy.PHY_2M:
-            length_us = int(length_us / 2)
-
-        packet_interval_us = int(math.ceil((length_us + 249) / 625) * 625)
-        logging.info(f"Packet length:   {length_us} microseconds")
-        logging.info(f"Packet interval: {packet_interval_us} microseconds")
-
-        return packet_interval_us
-
-    def _set_packet_type(self, pt: PacketType):
-        """
-        Set the packet type.
-        """
-        self.test.pkt = pt.value
-
-    def set_packet_type_PRBS9(self):
-        """
-        Set packet type to pseudorandom binary sequence.
-        """
-        self._set_packet_type(PacketType.PRBS9)
-
-    def set_packet_type_11110000(self):
-        """
-        Set packet type to 11110000.
-        """
-        self._set_packet_type(PacketType.B_11110000)
-
-    def set_packet_type_10101010(self):
-        """
-        Set packet type to 10101010.
-        """
-        self._set_packet_type(PacketType.B_10101010)
+        ts = self._upper_length_command(length)
+        if ts is not None:
+            self._send_cmd(ts)
+            self.packet_length = length
 
 
 # To increase verbosity, the level can be set to DEBUG.
@@ -0,0 +1,260 @@
+#
+# Running the same operation on many DUTs in parallel
+#
+# SPDX-License-Identifier: LicenseRef-LairdConnectivity-Clause
+#
+# Each DUT is used by one worker thread at a time. Most of the time of an
+# operation is spent waiting for the serial port or sleeping for a test
+# duration, so threads run the DUTs in parallel.
+#
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import threading
+import time
+from dtm import DTM, Region
+from plan import compile_plan, run_plan
+from results import ResultSink, TestRecord
+
+logger = logging.getLogger(__name__)
+
+_CONFIGURE = {
+    Region.CE: "configure_for_ce",
+    Region.FCC_IC: "configure_for_north_america",
+    Region.RCM: "configure_for_australia_nz",
+}
+
+
+class SharedSink(ResultSink):
+    """
+    Pass the records of several DUTs to one sink (records can be emitted by any thread).
+    """
+
+    def __init__(self, sink: ResultSink):
+        super().__init__(sink.batch_size)
+        self.sink = sink
+        self._lock = threading.Lock()
+
+    def emit(self, record: TestRecord):
+        with self._lock:
+            self.records += 1
+            self.sink.emit(record)
+
+    def flush(self):
+        with self._lock:
+            self.sink.flush()
+
+    def close(self):
+        with self._lock:
+            self.sink.close()
+
+
+class FarmResult:
+    """
+    Result of running an operation on each DUT of a :py:class:`DTMFarm`.
+    """
+
+    def __init__(self, operation: str):
+        self.operation = operation
+        self.results = {}
+        """DUT name to the value returned by the operation"""
+        self.failures = {}
+        """DUT name to the exception raised by the operation"""
+        self.durations = {}
+        """DUT name to the time the operation took (seconds)"""
+        self.commands = 0
+        """Number of commands sent to all DUTs"""
+        self.elapsed = 0.0
+        """Time to run the operation on all DUTs (seconds)"""
+
+    @property
+    def ok(self) -> bool:
+        return len(self.failures) == 0
+
+    def commands_per_second(self) -> float:
+        return self.commands / self.elapsed if self.elapsed > 0 else 0.0
+
+    def duts_per_second(self) -> float:
+        """
+        DUTs that completed the operation per second.
+        """
+        return len(self.results) / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self) -> str:
+        lines = [
+            f"{self.operation}: {len(self.results)} passed, {len(self.failures)} failed "
+            f"in {self.elapsed:.3f} s ({self.commands_per_second():.0f} commands/s)"
+        ]
+        for name, e in self.failures.items():
+            lines.append(f"  {name}: {e}")
+        return "\n".join(lines)
+
+
+def _rx_test(dut: DTM, freq, duration: float) -> int:
+    dut.start_rx_test(freq, duration)
+    return dut.packet_count
+
+
+def _tx_test(dut: DTM, freq, duration: float) -> int:
+    dut.start_tx_test(freq, duration)
+    return dut.packet_count
+
+
+def _run_plan(dut: DTM, plan: dict) -> list:
+    return run_plan(dut, compile_plan(plan, dut))
+
+
+class DTMFarm:
+    """
+    A set of DUTs that run the same operation in parallel worker threads.
+
+    A DUT that fails (e.g., a port that can't be opened or a command that isn't
+    answered) is reported in the result without stopping the others.
+
+    :param list ports: Communication ports or transport URLs to open
+        (they are opened in parallel)
+    :param list duts: Already open :py:class:`dtm.DTM` objects to include
+    :param int max_workers: Number of worker threads (default is one per DUT)
+    :param sink: If present, a :py:class:`results.ResultSink` that receives the
+        results of all DUTs
+    :param kwargs: Passed to :py:class:`dtm.DTM` when a port is opened
+        (e.g., probe_baud_rates)
+    """
+
+    def __init__(
+        self,
+        ports: list = (),
+        duts: list = (),
+        max_workers: int = None,
+        sink: ResultSink = None,
+        **kwargs,
+    ):
+        if max_workers is None:
+            max_workers = max(1, len(ports) + len(duts))
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="dtm")
+        self.duts = {}
+        """DUT name to :py:class:`dtm.DTM` (names are unique)"""
+        self.failures = {}
+        """Port to the exception raised when it was opened"""
+        self.sink = None if sink is None else SharedSink(sink)
+        for dut in duts:
+            self._add(dut)
+        futures = [(port, self._executor.submit(DTM, port, **kwargs)) for port in ports]
+        for port, future in futures:
+            try:
+                self._add(future.result())
+            except Exception as e:
+                logger.error("%s couldn't be opened: %s", port, e)
+                self.failures[port] = e
+
+    def _add(self, dut: DTM):
+        """
+        Add a DUT. If another DUT has the same name, "#n" is added to its name
+        (e.g., two simulators or the same URL opened twice).
+        """
+        if self.sink is not None:
+            dut.sink = self.sink
+        name = dut.name
+        n = 1
+        while name in self.duts:
+            n += 1
+            name = f"{dut.name}#{n}"
+        dut.name = name
+        self.duts[name] = dut
+
+    def _run_one(self, dut: DTM, name: str, operation, args: tuple, kwargs: dict):
+        before = dut.stats()["total"]["count"]
+        start = time.perf_counter()
+        try:
+            if isinstance(operation, str):
+                value = getattr(dut, operation)(*args, **kwargs)
+            else:
+                value = operation(dut, *args, **kwargs)
+            error = None
+        except Exception as e:
+            logger.error("%s %s failed: %s", dut.name, name, e)
+            value = None
+            error = e
+        duration = time.perf_counter() - start
+        return value, error, duration, dut.stats()["total"]["count"] - before
+
+    def run(self, operation, *args, **kwargs) -> FarmResult:
+        """
+        Run an operation on every DUT and wait for all of them to finish.
+
+        :param operation: Name of a :py:class:`dtm.DTM` method (e.g., "start_tx_sweep")
+            or a callable that takes the DUT as its first parameter
+        :param args: Passed to the operation
+        :param kwargs: Passed to the operation
+        """
+        name = operation if isinstance(operation, str) else operation.__name__.lstrip("_")
+        result = FarmResult(name)
+        start = time.perf_counter()
+        futures = [
+            (dut.name, self._executor.submit(self._run_one, dut, name, operation, args, kwargs))
+            for dut in self.duts.values()
+        ]
+        for dut_name, future in futures:
+            value, error, duration, commands = future.result()
+            if error is None:
+                result.results[dut_name] = value
+            else:
+                result.failures[dut_name] = error
+            result.durations[dut_name] = duration
+            result.commands += commands
+        result.elapsed = time.perf_counter() - start
+        if self.sink is not None:
+            self.sink.flush()
+        logger.info(result.summary())
+        return result
+
+    def configure(self, region: Region, internal_antenna: bool = False) -> FarmResult:
+        """
+        Configure every DUT for a region (CE, FCC_IC, or RCM).
+        """
+        if region == Region.CE:
+            return self.run(_CONFIGURE[region])
+        return self.run(_CONFIGURE[region], internal_antenna)
+
+    def sweep(self, *args, **kwargs) -> FarmResult:
+        """
+        Sweep every DUT (see :py:meth:`dtm.DTM.sweep`).
+        The result of each DUT is its :py:class:`sweep.SweepReport`.
+        """
+        return self.run("sweep", *args, **kwargs)
+
+    def tx_test(self, freq=None, duration: float = 1.0) -> FarmResult:
+        """
+        Transmit test on every DUT.
+        The result of each DUT is the estimated number of packets sent.
+        """
+        return self.run(_tx_test, freq, duration)
+
+    def rx_test(self, freq=None, duration: float = 1.0) -> FarmResult:
+        """
+        Receive test on every DUT.
+        The result of each DUT is the number of packets received.
+        """
+        return self.run(_rx_test, freq, duration)
+
+    def run_plan(self, plan: dict) -> FarmResult:
+        """
+        Compile a plan (see :py:func:`plan.compile_plan`) for each DUT and run it.
+        The result of each DUT is the list returned by :py:func:`plan.run_plan`.
+        """
+        return self.run(_run_plan, plan)
+
+    def close(self):
+        for dut in self.duts.values():
+            try:
+                dut.transport.close()
+            except Exception:
+                pass
+        if self.sink is not None:
+            self.sink.flush()
+        self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
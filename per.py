@@ -0,0 +1,181 @@
+#
+# Packet error rate (PER) characterization of a transmitter/receiver pair
+#
+# SPDX-License-Identifier: LicenseRef-LairdConnectivity-Clause
+#
+import logging
+from array import array
+from dtm import (
+    CHANNEL_MAX,
+    CHANNEL_MIN,
+    DTM,
+    PACKET_LENGTH_MAX,
+    PacketType,
+    Phy,
+    Region,
+)
+
+logger = logging.getLogger(__name__)
+
+AXES = ("phy", "packet_length", "power", "packet_type", "channel")
+"""Order of the axes of a :py:class:`PerMatrix` (outermost first).
+
+Changing the PHY or packet length costs a setup command on both DUTs and changing
+the power costs a vendor specific command on the transmitter, so they are changed
+least often. The packet type and channel are fields of the start test command.
+"""
+
+
+class PerMatrix:
+    """
+    Packets sent and received for every combination of the axes.
+
+    Counts are stored in flat arrays in :py:data:`AXES` order (the channel
+    changes fastest). A count of -1 means the cell wasn't measured
+    (e.g., the end test command failed).
+    """
+
+    def __init__(self, phys, packet_lengths, powers, packet_types, channels):
+        self.axes = (
+            tuple(phys),
+            tuple(packet_lengths),
+            tuple(powers),
+            tuple(packet_types),
+            tuple(channels),
+        )
+        """Values of each axis in :py:data:`AXES` order"""
+        size = 1
+        for values in self.axes:
+            size *= len(values)
+        self.sent = array("q", [-1]) * size
+        """Estimated packets sent by the transmitter"""
+        self.uncertainty = array("q", [0]) * size
+        """Possible error (+/-) of :py:attr:`sent`"""
+        self.received = array("q", [-1]) * size
+        """Packets received"""
+
+    @property
+    def shape(self) -> tuple:
+        return tuple(len(values) for values in self.axes)
+
+    def __len__(self) -> int:
+        return len(self.sent)
+
+    def index(self, phy, packet_length, power, packet_type, channel) -> int:
+        """
+        :returns: position of a cell in the flat arrays
+        """
+        i = 0
+        for values, value in zip(
+            self.axes, (phy, packet_length, power, packet_type, channel)
+        ):
+            i = i * len(values) + values.index(value)
+        return i
+
+    def per(self, i: int) -> float:
+        """
+        Packet error rate of cell i (0.0-1.0).
+
+        More packets than the estimate can be received, so the rate is limited to 0.
+
+        :returns: None if the cell wasn't measured or no packets were sent
+        """
+        sent = self.sent[i]
+        received = self.received[i]
+        if sent <= 0 or received < 0:
+            return None
+        return max(0.0, 1.0 - received / sent)
+
+    def cells(self):
+        """
+        Iterate over all cells in :py:data:`AXES` order.
+
+        :returns: (phy, packet_length, power, packet_type, channel, sent, received, per)
+        """
+        i = 0
+        for phy in self.axes[0]:
+            for length in self.axes[1]:
+                for power in self.axes[2]:
+                    for pt in self.axes[3]:
+                        for channel in self.axes[4]:
+                            yield (
+                                phy,
+                                length,
+                                power,
+                                pt,
+                                channel,
+                                self.sent[i],
+                                self.received[i],
+                                self.per(i),
+                            )
+                            i += 1
+
+
+def run_per_matrix(
+    tx: DTM,
+    rx: DTM,
+    channels: list = None,
+    phys: list = (Phy.PHY_1M,),
+    packet_lengths: list = (PACKET_LENGTH_MAX,),
+    packet_types: list = (PacketType.PRBS9,),
+    powers: list = (None,),
+    duration: float = 1.0,
+) -> PerMatrix:
+    """
+    Measure the packet error rate of rx receiving from tx for every combination
+    of channel, PHY, packet length, packet type, and transmit power.
+
+    The PHY and packet length are set on both DUTs. Setup commands are only sent
+    when a value changes (see :py:attr:`dtm.DTM.cache_registers`).
+
+    :param list channels: Physical channels (default is all channels)
+    :param list phys: :py:class:`dtm.Phy` values
+    :param list packet_lengths: Packet lengths (0-255)
+    :param list packet_types: :py:class:`dtm.PacketType` values
+    :param list powers: SoC output powers (:py:data:`dtm.NRF5340_SOC_PWR_TABLE`).
+        None uses the current power (or the region power table).
+    :param duration: Length of each transmit test in seconds
+    :returns: None if an axis is invalid
+    """
+    if channels is None:
+        channels = range(CHANNEL_MIN, CHANNEL_MAX + 1)
+    for channel in channels:
+        if channel > CHANNEL_MAX or channel < CHANNEL_MIN:
+            logger.error("Invalid channel")
+            return None
+    for length in packet_lengths:
+        if length > PACKET_LENGTH_MAX or length < 0:
+            logger.error("Invalid packet length")
+            return None
+    if tx.region != Region.UNSET and any(p is not None for p in powers):
+        logger.error("Power cannot be set manually when a region is set")
+        return None
+
+    result = PerMatrix(phys, packet_lengths, powers, packet_types, channels)
+    i = 0
+    for phy in result.axes[0]:
+        tx._set_phy(phy)
+        rx._set_phy(phy)
+        for length in result.axes[1]:
+            tx.set_packet_length(length)
+            rx.set_packet_length(length)
+            for power in result.axes[2]:
+                if power is not None:
+                    tx.set_tx_power(power)
+                for pt in result.axes[3]:
+                    tx._set_packet_type(pt)
+                    rx._set_packet_type(pt)
+                    for channel in result.axes[4]:
+                        tx.set_channel_physical(channel)
+                        rx.set_channel_physical(channel)
+                        rx.start_rx_test()
+                        tx.start_tx_test(duration=duration)
+                        sent = tx.packet_count
+                        uncertainty = tx.packet_count_uncertainty
+                        rx.end_test()
+                        result.sent[i] = sent
+                        result.uncertainty[i] = uncertainty
+                        result.received[i] = rx.packet_count
+                        i += 1
+        logger.info("PER %s complete", phy.name)
+    return result
@@ -0,0 +1,546 @@
+#
+# Declarative test plans compiled to command words
+#
+# SPDX-License-Identifier: LicenseRef-LairdConnectivity-Clause
+#
+# A plan is a dict (e.g., loaded from JSON):
+#
+# {
+#     "region": "FCC_IC",            # optional: CE, FCC_IC, or RCM
+#     "internal_antenna": False,     # optional
+#     "steps": [
+#         {
+#             "test": "tx",          # tx, rx, or carrier
+#             "channels": [0, 19, 39],  # physical channels (default is all, not empty)
+#             "duration": 1.0,       # seconds on each channel
+#             "phy": "2M",           # optional: 1M, 2M, CODED_S8, or CODED_S2
+#             "length": 37,          # optional: packet length (0-255)
+#             "packet_type": "PRBS9",  # optional: PRBS9, B_11110000, or B_10101010
+#             "power": -8,           # optional: SoC power (region must not be set)
+#             "fem_gain": 20,        # optional: FEM gain register (1-31)
+#             "barrier": False,      # optional: optimize_plan doesn't move steps
+#                                    # across a step with a barrier
+#         },
+#     ],
+# }
+#
+# Settings that aren't in a step are unchanged from the previous step.
+#
+import logging
+from dtm import (
+    BAUD_RATE,
+    CHANNEL_MAX,
+    CHANNEL_MIN,
+    DTM,
+    NRF5340_SOC_PWR_TABLE,
+    PACKET_LENGTH_MAX,
+    RESET_PHY_WORD,
+    SHADOW_PHY,
+    SHADOW_REGISTERS,
+    SHADOW_UPPER_LENGTH,
+    SHADOW_WORDS,
+    CommandType,
+    DTMCore,
+    PacketType,
+    Phy,
+    Region,
+    TestSetup,
+    VendorSpecific,
+)
+
+logger = logging.getLogger(__name__)
+
+TESTS = ("tx", "rx", "carrier")
+STEP_KEYS = (
+    "test",
+    "channels",
+    "duration",
+    "phy",
+    "length",
+    "packet_type",
+    "power",
+    "fem_gain",
+    "barrier",
+)
+PLAN_KEYS = ("region", "internal_antenna", "steps")
+CHANNELS = tuple(range(CHANNEL_MIN, CHANNEL_MAX + 1))
+"""Channels of a step that doesn't list them"""
+
+PHYS = {
+    "1M": Phy.PHY_1M,
+    "2M": Phy.PHY_2M,
+    "CODED_S8": Phy.CODED_PHY_S8,
+    "CODED_S2": Phy.CODED_PHY_S2,
+}
+"""PHY names in plans (:py:class:`dtm.Phy` names can also be used)"""
+
+PACKET_TYPES = ("PRBS9", "B_11110000", "B_10101010")
+REGIONS = ("CE", "FCC_IC", "RCM")
+
+# CE configuration (see DTM.configure_for_ce)
+CE_POWER = -16
+CE_FEM_GAIN = 23
+
+# Time on the wire for a command and its response: 4 bytes of 10 bits
+COMMAND_BITS = 40
+FIRMWARE_OVERHEAD_SECONDS = 0.0005
+
+
+def _phy(name) -> Phy:
+    if isinstance(name, Phy):
+        return name
+    if name in PHYS:
+        return PHYS[name]
+    return Phy[name]
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _is_int(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def validate_plan(plan: dict) -> list:
+    """
+    Check a plan without compiling it.
+
+    :returns: description of each error (empty if the plan is valid)
+    """
+    if not isinstance(plan, dict):
+        return ["Plan must be a dict"]
+    errors = []
+    for key in plan:
+        if key not in PLAN_KEYS:
+            errors.append(f"Unknown plan key '{key}'")
+    region = plan.get("region")
+    if region is not None and region not in REGIONS:
+        errors.append(f"Invalid region '{region}'")
+    if not isinstance(plan.get("internal_antenna", False), bool):
+        errors.append("internal_antenna must be true or false")
+    steps = plan.get("steps", [])
+    if not isinstance(steps, list):
+        errors.append("steps must be a list")
+        return errors
+    if len(steps) == 0:
+        errors.append("Plan has no steps")
+    for i, step in enumerate(steps):
+        prefix = f"Step {i}:"
+        if not isinstance(step, dict):
+            errors.append(f"{prefix} must be a dict")
+            continue
+        for key in step:
+            if key not in STEP_KEYS:
+                errors.append(f"{prefix} unknown key '{key}'")
+        if step.get("test") not in TESTS:
+            errors.append(f"{prefix} test must be one of {', '.join(TESTS)}")
+        channels = step.get("channels", CHANNELS)
+        if not isinstance(channels, (list, tuple)):
+            errors.append(f"{prefix} channels must be a list")
+            channels = []
+        elif len(channels) == 0:
+            errors.append(f"{prefix} channels must not be empty")
+        for channel in channels:
+            if not _is_int(channel) or not CHANNEL_MIN <= channel <= CHANNEL_MAX:
+                errors.append(f"{prefix} invalid channel {channel}")
+        duration = step.get("duration", 0)
+        if not _is_number(duration):
+            errors.append(f"{prefix} duration must be a number")
+        elif duration < 0:
+            errors.append(f"{prefix} duration must not be negative")
+        if "phy" in step:
+            try:
+                _phy(step["phy"])
+            except (KeyError, TypeError):
+                errors.append(f"{prefix} invalid PHY '{step['phy']}'")
+        length = step.get("length", 0)
+        if not _is_int(length) or not 0 <= length <= PACKET_LENGTH_MAX:
+            errors.append(f"{prefix} invalid packet length {length}")
+        if step.get("packet_type", "PRBS9") not in PACKET_TYPES:
+            errors.append(f"{prefix} invalid packet type '{step['packet_type']}'")
+        if "power" in step:
+            if not _is_int(step["power"]) or step["power"] not in NRF5340_SOC_PWR_TABLE:
+                errors.append(f"{prefix} invalid SoC output power {step['power']}")
+            if region is not None:
+                errors.append(f"{prefix} power cannot be set when a region is set")
+        if "fem_gain" in step:
+            fem_gain = step["fem_gain"]
+            if not _is_int(fem_gain) or not 0 < fem_gain < 32:
+                errors.append(f"{prefix} invalid FEM gain {fem_gain}")
+        if not isinstance(step.get("barrier", False), bool):
+            errors.append(f"{prefix} barrier must be true or false")
+    return errors
+
+
+class Batch:
+    """
+    Commands sent back-to-back, followed by a wait.
+    """
+
+    __slots__ = ("words", "wait", "step", "channel", "test")
+
+    def __init__(self, words: list, wait: float, step: int, channel: int, test: str):
+        self.words = words
+        """Command words"""
+        self.wait = wait
+        """Seconds to wait after the responses are received"""
+        self.step = step
+        """Index of the plan step (None for region configuration and the final end test)"""
+        self.channel = channel
+        self.test = test
+        """Test started by the batch (None if it doesn't start a test)"""
+
+
+class CompiledPlan:
+    """
+    Command words of a plan.
+    """
+
+    def __init__(self, state: DTMCore):
+        self.batches = []
+        """:py:class:`Batch` in the order they are sent"""
+        self.suppressed = 0
+        """Setup commands removed because they wouldn't change the DUT"""
+        self.state = state
+        """State of the DUT after the plan has run"""
+
+    @property
+    def commands(self) -> int:
+        """
+        Number of commands sent.
+        """
+        return sum(len(b.words) for b in self.batches)
+
+    @property
+    def test_time(self) -> float:
+        """
+        Time spent waiting for tests (seconds).
+        """
+        return sum(b.wait for b in self.batches)
+
+    def estimate(self, baud_rate: int = BAUD_RATE, pipelined: bool = True) -> float:
+        """
+        Estimate the time to run the plan (seconds).
+
+        :param int baud_rate: UART baud rate
+        :param bool pipelined: If False, each command waits for the previous response
+        """
+        wire = COMMAND_BITS / baud_rate
+        total = self.test_time
+        for b in self.batches:
+            if pipelined:
+                total += wire * len(b.words) + FIRMWARE_OVERHEAD_SECONDS
+            else:
+                total += (wire + FIRMWARE_OVERHEAD_SECONDS) * len(b.words)
+        return total
+
+
+class _Compiler:
+    def __init__(self, dut: DTM):
+        self.core = DTMCore()
+        self.core._init_state(None)
+        self.shadow = [None] * len(SHADOW_REGISTERS)
+        if dut is None:
+            # State after DTM.__init__ (reset and maximum packet length)
+            self.shadow[SHADOW_PHY] = RESET_PHY_WORD
+            self.shadow[SHADOW_UPPER_LENGTH] = self.core._upper_length_command(
+                PACKET_LENGTH_MAX
+            )
+        else:
+            core = self.core
+            for name in ("packet_length", "phy", "antenna", "region", "tx_power"):
+                setattr(core, name, getattr(dut, name))
+            for name in ("cmd", "freq", "length", "pkt"):
+                setattr(core.test, name, getattr(dut.test, name))
+            core._update_power_base()
+            if dut.cache_registers:
+                self.shadow = list(dut._shadow)
+        self.result = CompiledPlan(self.core)
+        self.words = []
+
+    def add(self, word: int):
+        if word is None:
+            return
+        register = SHADOW_WORDS.get(word, -1)
+        if register >= 0:
+            if self.shadow[register] == word:
+                self.result.suppressed += 1
+                return
+            self.shadow[register] = word
+        self.words.append(word)
+
+    def emit(self, wait: float, step: int, channel: int, test: str):
+        self.result.batches.append(Batch(self.words, wait, step, channel, test))
+        self.words = []
+
+    def region(self, plan: dict) -> bool:
+        name = plan.get("region")
+        if name is None:
+            return True
+        core = self.core
+        if not core._configure_region(Region[name], plan.get("internal_antenna", False)):
+            return False
+        if core.region == Region.CE:
+            self.add(core._tx_power_command(CE_POWER))
+            self.add(core._fem_gain_command(CE_FEM_GAIN))
+        return True
+
+    def step(self, i: int, step: dict, running: bool) -> bool:
+        core = self.core
+        test = step["test"]
+        if running:
+            self.add(core._end_command())
+        if "phy" in step:
+            phy = _phy(step["phy"])
+            core._select_phy(phy)
+            self.add(core._test_setup_command(TestSetup.SET_PHY, phy.value))
+        if "length" in step:
+            self.add(core._upper_length_command(step["length"]))
+            core.packet_length = step["length"]
+        if "packet_type" in step:
+            core._set_packet_type(PacketType[step["packet_type"]])
+        if "power" in step:
+            self.add(core._tx_power_command(step["power"]))
+        if "fem_gain" in step:
+            self.add(core._fem_gain_command(step["fem_gain"]))
+        channels = step.get("channels", CHANNELS)
+        duration = step.get("duration", 0.0)
+        for channel in channels:
+            if running and len(self.words) == 0:
+                self.add(core._end_command())
+            core.test.freq = channel
+            if test == "carrier":
+                self.add(core._vs_command(VendorSpecific.CARRIER_TEST, channel))
+            elif test == "tx":
+                core.test.cmd = CommandType.TX.value
+                self.add(core._region_power_command())
+                self.add(core.test.word)
+            else:
+                core.test.cmd = CommandType.RX.value
+                self.add(core.test.word)
+            self.emit(duration, i, channel, test)
+            running = True
+        return running
+
+
+def compile_plan(plan: dict, dut: DTM = None) -> CompiledPlan:
+    """
+    Convert a plan to the command words that run it.
+
+    Setup commands that wouldn't change the state of the DUT are removed.
+    The end of a test, the setup for the next one, and its start are sent as one batch.
+
+    :param dict plan: see the description at the top of this module
+    :param dut: If present, the plan starts from the state of this DUT.
+        Otherwise, it starts from the state after :py:meth:`dtm.DTM.__init__`.
+    :returns: None if the plan is invalid (errors are logged)
+    """
+    errors = validate_plan(plan)
+    if dut is not None and plan.get("region") is not None and dut.region != Region.UNSET:
+        errors.append("Region already set - reset board to set new region")
+    for e in errors:
+        logger.error(e)
+    if len(errors) > 0:
+        return None
+
+    compiler = _Compiler(dut)
+    compiler.region(plan)
+    running = False
+    for i, step in enumerate(plan["steps"]):
+        running = compiler.step(i, step, running)
+    if running:
+        compiler.add(compiler.core._end_command())
+    if len(compiler.words) > 0:
+        compiler.emit(0.0, None, None, None)
+    return compiler.result
+
+
+def run_plan(dut: DTM, compiled: CompiledPlan) -> list:
+    """
+    Send the commands of a compiled plan (which should have been compiled for dut).
+
+    :returns: (step, channel, packet count) of each receive test
+    """
+    results = []
+    previous = None
+    for batch in compiled.batches:
+        if previous is not None:
+            # The packet count is kept if the test being ended is a receive test
+            if previous.test == "rx":
+                dut.test.cmd = CommandType.RX.value
+            else:
+                dut.test.cmd = CommandType.TX.value
+        dut.send_batch(batch.words)
+        if previous is not None and previous.test == "rx":
+            results.append((previous.step, previous.channel, dut.packet_count))
+        previous = batch
+        dut.clock.sleep(batch.wait)
+    # Python side of the DUT state now matches the plan
+    state = compiled.state
+    for name in ("packet_length", "phy", "antenna", "region", "tx_power"):
+        setattr(dut, name, getattr(state, name))
+    for name in ("cmd", "freq", "length", "pkt"):
+        setattr(dut.test, name, getattr(state.test, name))
+    dut._update_power_base()
+    return results
+
+
+# Settings of a step that cost a command to change
+_SETTINGS = ("phy", "length", "packet_type", "power", "fem_gain")
+
+
+def _initial_settings(dut: DTM) -> dict:
+    if dut is None:
+        return {"phy": Phy.PHY_1M.name, "length": PACKET_LENGTH_MAX, "packet_type": "PRBS9"}
+    return {
+        "phy": dut.phy.name,
+        "length": dut.packet_length,
+        "packet_type": PacketType(dut.test.pkt).name,
+    }
+
+
+def _explicit_steps(plan: dict, dut: DTM) -> list:
+    """
+    Copy the steps of a plan with the settings inherited from earlier steps
+    (or the initial state) filled in, so that the steps can be reordered.
+    """
+    current = _initial_settings(dut)
+    steps = []
+    for step in plan["steps"]:
+        for key in _SETTINGS:
+            if key in step:
+                current[key] = step[key]
+        steps.append({**step, **current})
+    return steps
+
+
+def _setup_commands(a: dict, b: dict) -> int:
+    """
+    Number of setup commands needed to change from the settings of step a to step b.
+    """
+    return (
+        (_phy(a["phy"]) != _phy(b["phy"]))
+        + ((a["length"] >> 6) != (b["length"] >> 6))
+        + (a.get("power") != b.get("power"))
+        + (a.get("fem_gain") != b.get("fem_gain"))
+    )
+
+
+def _order_steps(steps: list, current: dict) -> list:
+    """
+    Greedily pick the step that needs the fewest setup commands after the current one.
+
+    Steps that use the initial power (or FEM gain) are run before any step that
+    changes it.
+    """
+    remaining = list(steps)
+    ordered = []
+    while len(remaining) > 0:
+        candidates = remaining
+        for key in ("power", "fem_gain"):
+            initial = [s for s in candidates if key not in s[1]]
+            if len(initial) > 0:
+                candidates = initial
+        best = min(
+            candidates,
+            key=lambda s: (_setup_commands(current, s[1]), _sort_key(s[1])),
+        )
+        remaining.remove(best)
+        ordered.append(best)
+        current = best[1]
+    return ordered
+
+
+def _sort_key(step: dict) -> tuple:
+    # Steps that use the initial power (or FEM gain) must run before it is changed
+    return (
+        "power" in step,
+        "fem_gain" in step,
+        _phy(step["phy"]).value,
+        step["length"],
+        step.get("power", 0),
+        step.get("fem_gain", 0),
+        step["packet_type"],
+    )
+
+
+def _sort_channels(plan: dict, step: dict):
+    """
+    Order the channels of a transmit step so that channels with the same
+    region power are adjacent.
+    """
+    if plan.get("region") is None or step["test"] != "tx":
+        return
+    core = DTMCore()
+    core._init_state(None)
+    core._configure_region(Region[plan["region"]], plan.get("internal_antenna", False))
+    core._select_phy(_phy(step["phy"]))
+    if core._region_power() is None:
+        return
+    channels = list(step.get("channels", CHANNELS))
+
+    def power(channel):
+        core.test.freq = channel
+        return core._region_power()
+
+    step["channels"] = sorted(channels, key=lambda c: (-power(c), c))
+
+
+def optimize_plan(plan: dict, dut: DTM = None) -> tuple:
+    """
+    Reorder the steps of a plan to minimize the setup commands.
+
+    Each step is followed by the step that needs the fewest setup commands
+    (PHY, upper bits of the packet length, power, and FEM gain).
+    The channels of transmit steps are ordered so that the region power changes
+    as few times as possible. Steps aren't moved across a step with "barrier" set.
+    The settings of each step are made explicit, so each step runs with the same
+    settings as in the original plan.
+
+    :param dict plan: see the description at the top of this module
+    :param dut: If present, the plan starts from the state of this DUT
+    :returns: (optimized plan, report) or (None, None) if the plan is invalid.
+        The report has "commands" and "time" (estimated seconds) before and after,
+        and "order" (index in the original plan of each optimized step).
+    """
+    before = compile_plan(plan, dut)
+    if before is None:
+        return None, None
+
+    steps = _explicit_steps(plan, dut)
+    segments = []
+    for i, step in enumerate(steps):
+        if len(segments) == 0 or step.get("barrier", False):
+            segments.append([])
+        segments[-1].append((i, step))
+    order = []
+    optimized = []
+    current = _initial_settings(dut)
+    for segment in segments:
+        # A barrier step stays first in its segment
+        fixed = segment[:1] if segment[0][1].get("barrier", False) else []
+        if len(fixed) > 0:
+            current = fixed[0][1]
+        moving = _order_steps(segment[len(fixed):], current)
+        for i, step in fixed + moving:
+            _sort_channels(plan, step)
+            order.append(i)
+            optimized.append(step)
+            current = step
+
+    result = {**plan, "steps": optimized}
+    after = compile_plan(result, dut)
+    report = {
+        "commands_before": before.commands,
+        "commands_after": after.commands,
+        "time_before": before.estimate(),
+        "time_after": after.estimate(),
+        "order": order,
+    }
+    logger.info(
+        "Plan optimized from %d to %d commands",
+        report["commands_before"],
+        report["commands_after"],
+    )
+    return result, report
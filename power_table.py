@@ -1,16 +1,30 @@
 #
 # BL5340PA Power Tables
 #
+# The tables are stored in power_tables/<region>.txt.
+#
 # *** These channels are in logical order (not physical) because that is
 # what the Nordic driver requires (C/Zephyr).
 #
+# Each region is loaded when it is first used. The compiled table (SoC power
+# in physical channel order) is cached in power_tables/__pycache__ and is
+# reused until the table file changes. A cache file ends with a checksum of
+# its contents, so a damaged file is compiled again instead of being used.
+#
 # SPDX-License-Identifier: LicenseRef-LairdConnectivity-Clause
 #
-from enum import Enum
+from array import array
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
+POWER_TABLE_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "power_tables")
+"""Directory containing a table file for each region"""
+CACHE_DIR = os.path.join(POWER_TABLE_DIR, "__pycache__")
+CHECKSUM_SIZE = 32
+
 
 def MPSL_FEM_POWER_REDUCE(p: int):
     """
@@ -23,707 +37,167 @@ def MPSL_FEM_POWER_REDUCE(p: int):
     return -p
 
 
-FCC_IC_EXT = {
-    "CODED_PHY_S8": [
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-    ],
-    "CODED_PHY_S2": [
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(7),
-    ],
-    "PHY_1M": [
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(7),
-    ],
-    "PHY_2M": [
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(12),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(12),
-    ],
-}
-
-FCC_IC_INT = {
-    "CODED_PHY_S8": [
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(8),
-    ],
-    "CODED_PHY_S2": [
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(5),
-    ],
-    "PHY_1M": [
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(5),
-    ],
-    "PHY_2M": [
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(8),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(8),
-    ],
-}
-
-RCM_EXT = {
-    "CODED_PHY_S8": [
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(7),
-        MPSL_FEM_POWER_REDUCE(7),
-        MPSL_FEM_POWER_REDUCE(7),
-        MPSL_FEM_POWER_REDUCE(7),
-        MPSL_FEM_POWER_REDUCE(7),
-        MPSL_FEM_POWER_REDUCE(7),
-        MPSL_FEM_POWER_REDUCE(7),
-        MPSL_FEM_POWER_REDUCE(7),
-        MPSL_FEM_POWER_REDUCE(7),
-        MPSL_FEM_POWER_REDUCE(7),
-        MPSL_FEM_POWER_REDUCE(7),
-        MPSL_FEM_POWER_REDUCE(7),
-        MPSL_FEM_POWER_REDUCE(7),
-        MPSL_FEM_POWER_REDUCE(7),
-        MPSL_FEM_POWER_REDUCE(7),
-        MPSL_FEM_POWER_REDUCE(7),
-        MPSL_FEM_POWER_REDUCE(7),
-        MPSL_FEM_POWER_REDUCE(7),
-        MPSL_FEM_POWER_REDUCE(7),
-        MPSL_FEM_POWER_REDUCE(7),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(7),
-    ],
-    "CODED_PHY_S2": [
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(7),
-        MPSL_FEM_POWER_REDUCE(7),
-        MPSL_FEM_POWER_REDUCE(7),
-        MPSL_FEM_POWER_REDUCE(7),
-        MPSL_FEM_POWER_REDUCE(7),
-        MPSL_FEM_POWER_REDUCE(7),
-        MPSL_FEM_POWER_REDUCE(7),
-        MPSL_FEM_POWER_REDUCE(7),
-        MPSL_FEM_POWER_REDUCE(7),
-        MPSL_FEM_POWER_REDUCE(7),
-        MPSL_FEM_POWER_REDUCE(7),
-        MPSL_FEM_POWER_REDUCE(7),
-        MPSL_FEM_POWER_REDUCE(7),
-        MPSL_FEM_POWER_REDUCE(7),
-        MPSL_FEM_POWER_REDUCE(7),
-        MPSL_FEM_POWER_REDUCE(7),
-        MPSL_FEM_POWER_REDUCE(7),
-        MPSL_FEM_POWER_REDUCE(7),
-        MPSL_FEM_POWER_REDUCE(7),
-        MPSL_FEM_POWER_REDUCE(7),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-    ],
-    "PHY_1M": [
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(6),
-    ],
-    "PHY_2M": [
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(6),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(6),
-    ],
-}
-
-RCM_INT = {
-    "CODED_PHY_S8": [
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-    ],
-    "CODED_PHY_S2": [
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(5),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-    ],
-    "PHY_1M": [
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-    ],
-    "PHY_2M": [
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-        MPSL_FEM_POWER_REDUCE(4),
-    ],
-}
-
 # strings match enumeration in dtm.py
 VALID_PHY_STRINGS = ["CODED_PHY_S8", "CODED_PHY_S2", "PHY_1M", "PHY_2M"]
 VALID_ANTENNA_STRINGS = ["INTERNAL", "EXTERNAL"]
 VALID_REGION_STRINGS = ["FCC_IC", "RCM"]
 
-POWER_TABLE = {
-    "FCC_IC": {"INTERNAL": FCC_IC_INT, "EXTERNAL": FCC_IC_EXT},
-    "RCM": {"INTERNAL": RCM_INT, "EXTERNAL": RCM_EXT},
-}
+CHANNEL_COUNT = 40
+
+
+def logical_to_physical(channel: int) -> int:
+    """
+    Physical channel (2*channel + 2402 MHz) of a logical (BLE) channel.
+    """
+    if channel == 37:
+        return 0
+    elif channel == 38:
+        return 12
+    elif channel == 39:
+        return 39
+    elif channel <= 10:
+        return channel + 1
+    else:
+        return channel + 2
+
+
+LOGICAL_TO_PHYSICAL = bytes(logical_to_physical(c) for c in range(CHANNEL_COUNT))
+PHYSICAL_TO_LOGICAL = bytes(LOGICAL_TO_PHYSICAL.index(c) for c in range(CHANNEL_COUNT))
+
+REGION_OFFSETS = {}
+"""(antenna, phy) to the start of its channels in a compiled region table"""
+for _antenna in VALID_ANTENNA_STRINGS:
+    for _phy in VALID_PHY_STRINGS:
+        REGION_OFFSETS[(_antenna, _phy)] = len(REGION_OFFSETS) * CHANNEL_COUNT
+REGION_SIZE = len(REGION_OFFSETS) * CHANNEL_COUNT
+
+# Compiled tables that have been loaded
+_regions = {}
+
+
+def parse_region(text: str, region: str = "") -> dict:
+    """
+    Read a table file.
+
+    Each line is: antenna, PHY, and the power reduction
+    (see :py:func:`MPSL_FEM_POWER_REDUCE`) of each logical channel.
+    Lines starting with # are comments.
+
+    :returns: antenna to PHY to SoC power of each logical channel
+    :raises ValueError: if the table isn't complete
+    """
+    table = {antenna: {} for antenna in VALID_ANTENNA_STRINGS}
+    for line in text.splitlines():
+        fields = line.split()
+        if len(fields) == 0 or fields[0].startswith("#"):
+            continue
+        antenna, modulation = fields[0], fields[1]
+        if antenna not in table or modulation not in VALID_PHY_STRINGS:
+            logger.error(f"Invalid table {region}.{antenna}.{modulation}")
+            raise ValueError("Invalid table name")
+        table[antenna][modulation] = [MPSL_FEM_POWER_REDUCE(int(p)) for p in fields[2:]]
 
-# Validate the table
-for region in VALID_REGION_STRINGS:
+    # Validate the table
     for antenna in VALID_ANTENNA_STRINGS:
         for modulation in VALID_PHY_STRINGS:
-            length = len(POWER_TABLE[region][antenna][modulation])
-            if length != 40:
+            length = len(table[antenna].get(modulation, []))
+            if length != CHANNEL_COUNT:
                 logger.error(
                     "Invalid length for " f"{region}.{antenna}.{modulation} ({length})"
                 )
                 raise ValueError("Invalid table size")
+    return table
+
+
+def compile_region(table: dict) -> array:
+    """
+    Convert a region (see :py:func:`parse_region`) to SoC powers in physical
+    channel order.
+
+    The power for a channel is compiled[REGION_OFFSETS[(antenna, phy)] + physical channel].
+    """
+    compiled = array("b")
+    for antenna in VALID_ANTENNA_STRINGS:
+        for modulation in VALID_PHY_STRINGS:
+            logical = table[antenna][modulation]
+            compiled.extend(logical[c] for c in PHYSICAL_TO_LOGICAL)
+    return compiled
+
+
+def _read_region(region: str) -> bytes:
+    with open(os.path.join(POWER_TABLE_DIR, f"{region}.txt"), "rb") as f:
+        return f.read()
+
+
+def _checksum(digest: str, compiled: bytes) -> bytes:
+    import hashlib
+
+    return hashlib.sha256(digest.encode() + compiled).digest()
+
+
+def load_region(region: str) -> array:
+    """
+    Compiled table of a region (see :py:func:`compile_region`).
+
+    The table is parsed and validated the first time the file is used; after
+    that the compiled table is read from the cache (if its checksum matches).
+
+    :param str region: one of :py:data:`VALID_REGION_STRINGS`
+    """
+    compiled = _regions.get(region)
+    if compiled is not None:
+        return compiled
+
+    import hashlib
+
+    data = _read_region(region)
+    digest = hashlib.sha256(data).hexdigest()[:16]
+    cache = os.path.join(CACHE_DIR, f"{region}.{digest}.bin")
+    compiled = array("b")
+    try:
+        with open(cache, "rb") as f:
+            b = f.read()
+        if len(b) == REGION_SIZE + CHECKSUM_SIZE and b[REGION_SIZE:] == _checksum(
+            digest, b[:REGION_SIZE]
+        ):
+            compiled.frombytes(b[:REGION_SIZE])
+        else:
+            logger.warning("Power table cache %s is damaged", cache)
+    except OSError:
+        pass
+    if len(compiled) != REGION_SIZE:
+        compiled = compile_region(parse_region(data.decode(), region))
+        b = compiled.tobytes()
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            with open(cache + ".tmp", "wb") as f:
+                f.write(b + _checksum(digest, b))
+            os.replace(cache + ".tmp", cache)
+        except OSError:
+            logger.debug("Power table cache can't be written")
+    _regions[region] = compiled
+    return compiled
+
+
+# Tables that used to be defined in this module (loaded on first use)
+_LEGACY_TABLES = {
+    "FCC_IC_EXT": ("FCC_IC", "EXTERNAL"),
+    "FCC_IC_INT": ("FCC_IC", "INTERNAL"),
+    "RCM_EXT": ("RCM", "EXTERNAL"),
+    "RCM_INT": ("RCM", "INTERNAL"),
+}
+
+
+def __getattr__(name: str):
+    if name == "POWER_TABLE":
+        value = {
+            region: parse_region(_read_region(region).decode(), region)
+            for region in VALID_REGION_STRINGS
+        }
+    elif name in _LEGACY_TABLES:
+        region, antenna = _LEGACY_TABLES[name]
+        value = __getattr__("POWER_TABLE")[region][antenna]
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
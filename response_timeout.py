@@ -0,0 +1,134 @@
+#
+# Response timeout derived from the observed round trip time
+#
+# SPDX-License-Identifier: LicenseRef-LairdConnectivity-Clause
+#
+from array import array
+import logging
+
+logger = logging.getLogger(__name__)
+
+WINDOW = 64
+"""Number of recent round trip times kept"""
+MIN_SAMPLES = 16
+"""Round trips observed before the timeout is reduced from the ceiling"""
+
+
+class ResponseTimeout:
+    """
+    Read timeout for a DUT.
+
+    The timeout is a high percentile of recent round trip times multiplied by a
+    safety factor, plus the time to send the largest batch, kept between a floor
+    and a ceiling. Until enough round trips have been observed it is the ceiling.
+    After a timeout the value is doubled (up to the ceiling) so that a slow
+    adapter doesn't cause repeated false timeouts.
+
+    All of the attempts of a command (or batch) share a budget of one ceiling.
+    When the timeout expires, DTM sends an idempotent command again if the rest
+    of the budget allows it; otherwise it waits for a late response with what is
+    left, so that it isn't mistaken for the response to the next command.
+
+    Round trip times are measured with the DTM clock. With a
+    :py:class:`clock.VirtualClock` they are 0, so the timeout is the floor.
+
+    :param float floor: Shortest timeout in seconds
+    :param float ceiling: Longest timeout in seconds
+    :param float factor: Multiplier applied to the percentile
+    :param int percentile: Percentile of recent round trip times (0-100)
+    """
+
+    __slots__ = (
+        "floor",
+        "ceiling",
+        "factor",
+        "percentile",
+        "word_time",
+        "value",
+        "changes",
+        "expirations",
+        "late",
+        "_samples",
+        "_count",
+    )
+
+    def __init__(
+        self,
+        floor: float = 0.05,
+        ceiling: float = 1.0,
+        factor: float = 3.0,
+        percentile: int = 99,
+    ):
+        self.floor = floor
+        self.ceiling = ceiling
+        self.factor = factor
+        self.percentile = percentile
+        self.word_time = 0.0
+        """Time to send a command and receive its response on the wire
+        (40 bit times on a UART)"""
+        self.value = ceiling
+        """Current timeout in seconds"""
+        self.changes = 0
+        self.expirations = 0
+        self.late = 0
+        """Responses received after the timeout (within the budget of the command)"""
+        self._samples = array("d", [0.0]) * WINDOW
+        self._count = 0
+
+    def set_baud_rate(self, baud_rate: int):
+        """
+        Include the time to send the largest batch at baud_rate in the timeout
+        (None for transports that aren't a UART).
+        """
+        self.word_time = 40 / baud_rate if baud_rate else 0.0
+
+    def observe(self, latency: float, batch_max: int) -> bool:
+        """
+        Add a round trip time.
+
+        The timeout is recomputed every :py:data:`MIN_SAMPLES` round trips.
+
+        :param float latency: Time from writing a command (or batch) until its
+            response was received
+        :param int batch_max: Largest number of commands sent at once
+        :returns: True if :py:attr:`value` changed
+        """
+        count = self._count
+        self._samples[count % WINDOW] = latency
+        self._count = count = count + 1
+        if count < MIN_SAMPLES or count % MIN_SAMPLES != 0:
+            return False
+        samples = sorted(self._samples[: min(count, WINDOW)])
+        rtt = samples[min(len(samples) - 1, len(samples) * self.percentile // 100)]
+        value = rtt * self.factor + batch_max * self.word_time
+        return self._set(min(max(value, self.floor), self.ceiling))
+
+    def expired(self) -> bool:
+        """
+        A response wasn't received before the timeout.
+
+        :returns: True if :py:attr:`value` changed
+        """
+        self.expirations += 1
+        return self._set(min(self.value * 2, self.ceiling))
+
+    def _set(self, value: float) -> bool:
+        # Changing the timeout of a serial port reconfigures it,
+        # so small changes are ignored.
+        if abs(value - self.value) <= self.value * 0.1:
+            return False
+        logger.debug("Response timeout %.1f ms", value * 1e3)
+        self.value = value
+        self.changes += 1
+        return True
+
+    def snapshot(self) -> dict:
+        return {
+            "timeout_ms": self.value * 1e3,
+            "floor_ms": self.floor * 1e3,
+            "ceiling_ms": self.ceiling * 1e3,
+            "round_trips": self._count,
+            "changes": self.changes,
+            "expirations": self.expirations,
+            "late": self.late,
+        }
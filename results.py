@@ -0,0 +1,192 @@
+#
+# Structured test results
+#
+# SPDX-License-Identifier: LicenseRef-LairdConnectivity-Clause
+#
+import logging
+
+logger = logging.getLogger(__name__)
+
+FIELDS = (
+    "time",
+    "dut",
+    "port",
+    "test",
+    "channel",
+    "phy",
+    "packet_length",
+    "packet_type",
+    "power",
+    "region",
+    "start",
+    "end",
+    "packet_count",
+    "uncertainty",
+)
+"""Fields of a :py:class:`TestRecord` (and columns of CSV/NumPy output)"""
+
+
+class TestRecord:
+    """
+    Outcome of one test (or one channel of a sweep).
+
+    :py:attr:`start` and :py:attr:`end` are from the clock used by DTM;
+    :py:attr:`time` is the wall clock time (seconds since the epoch) when the
+    test ended.
+    """
+
+    __slots__ = FIELDS
+
+    def __init__(self, **fields):
+        for name in FIELDS:
+            setattr(self, name, fields.get(name))
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in FIELDS}
+
+    def as_tuple(self) -> tuple:
+        return tuple(getattr(self, name) for name in FIELDS)
+
+
+class ResultSink:
+    """
+    Destination for test records.
+
+    Records are buffered and written batch_size at a time (and by
+    :py:meth:`flush`/:py:meth:`close`).
+    """
+
+    def __init__(self, batch_size: int = 100):
+        self.batch_size = batch_size
+        self.records = 0
+        """Number of records emitted"""
+        self._pending = []
+
+    def emit(self, record: TestRecord):
+        self._pending.append(record)
+        self.records += 1
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if len(self._pending) > 0:
+            self._write(self._pending)
+            self._pending = []
+
+    def _write(self, records: list):
+        raise NotImplementedError
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class MemorySink(ResultSink):
+    """
+    Keep records in a list (e.g., for scripts that analyze results directly).
+    """
+
+    def __init__(self):
+        super().__init__(batch_size=1)
+        self.results = []
+
+    def _write(self, records: list):
+        self.results.extend(records)
+
+
+class JsonlSink(ResultSink):
+    """
+    One JSON object per line.
+    """
+
+    def __init__(self, path: str, batch_size: int = 100):
+        super().__init__(batch_size)
+        self.file = open(path, "a")
+
+    def _write(self, records: list):
+        import json
+
+        self.file.write(
+            "".join(json.dumps(r.as_dict()) + "\n" for r in records))
+        self.file.flush()
+
+    def close(self):
+        super().close()
+        self.file.close()
+
+
+class CsvSink(ResultSink):
+    """
+    Comma separated values with a header row of :py:data:`FIELDS`.
+    """
+
+    def __init__(self, path: str, batch_size: int = 100):
+        super().__init__(batch_size)
+        import csv
+
+        self.file = open(path, "w", newline="")
+        self._writer = csv.writer(self.file)
+        self._writer.writerow(FIELDS)
+
+    def _write(self, records: list):
+        self._writer.writerows(r.as_tuple() for r in records)
+        self.file.flush()
+
+    def close(self):
+        super().close()
+        self.file.close()
+
+
+class NpzSink(ResultSink):
+    """
+    NumPy archive with one array per field.
+
+    The archive can only be written once, so columns are collected in memory
+    and saved by :py:meth:`close`. Requires numpy.
+    """
+
+    def __init__(self, path: str):
+        import numpy
+
+        super().__init__(batch_size=1000)
+        self.path = path
+        self._numpy = numpy
+        self._columns = {name: [] for name in FIELDS}
+
+    def _write(self, records: list):
+        for name, column in self._columns.items():
+            column.extend(getattr(r, name) for r in records)
+
+    def close(self):
+        super().close()
+        np = self._numpy
+        arrays = {}
+        for name, column in self._columns.items():
+            if any(isinstance(v, str) for v in column):
+                arrays[name] = np.array(
+                    ["" if v is None else v for v in column])
+            else:
+                arrays[name] = np.array(
+                    [np.nan if v is None else v for v in column], dtype=float
+                )
+        np.savez(self.path, **arrays)
+
+
+SINKS = {".jsonl": JsonlSink, ".csv": CsvSink, ".npz": NpzSink}
+"""File extension to sink"""
+
+
+def open_sink(path: str) -> ResultSink:
+    """
+    Create a sink for a file. The format is selected by the extension
+    (.jsonl, .csv, or .npz).
+    """
+    for ext, sink in SINKS.items():
+        if path.endswith(ext):
+            return sink(path)
+    raise ValueError(f"Unsupported result file '{path}'")
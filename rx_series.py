@@ -0,0 +1,62 @@
+#
+# Packet counts of long receive tests
+#
+# SPDX-License-Identifier: LicenseRef-LairdConnectivity-Clause
+#
+from array import array
+
+
+class RxSeries:
+    """
+    Packets received in each interval of a long receive test.
+
+    The packet report of the DUT is 15 bits, so long tests are split into
+    intervals that are too short to overflow. Times are from the clock used by DTM
+    (seconds).
+    """
+
+    def __init__(self, channel: int, phy, period: float):
+        self.channel = channel
+        self.phy = phy
+        self.period = period
+        """Time between restarts of the receive test"""
+        self.starts = array("d")
+        """When each interval started (receive test acknowledged)"""
+        self.ends = array("d")
+        """When each interval ended (end test sent)"""
+        self.counts = array("q")
+        """Packets received in each interval (-1 if the end test command failed)"""
+        self.total = 0
+        """Packets received in all intervals"""
+
+    def append(self, start: float, end: float, count: int):
+        self.starts.append(start)
+        self.ends.append(end)
+        self.counts.append(count)
+        if count > 0:
+            self.total += count
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    @property
+    def failures(self) -> int:
+        """
+        Number of intervals without a packet count.
+        """
+        return self.counts.count(-1)
+
+    @property
+    def duration(self) -> float:
+        if len(self.counts) == 0:
+            return 0.0
+        return self.ends[-1] - self.starts[0]
+
+    def rates(self) -> list:
+        """
+        :returns: packets/second of each interval
+        """
+        return [
+            (c / (e - s)) if c >= 0 and e > s else 0.0
+            for s, e, c in zip(self.starts, self.ends, self.counts)
+        ]
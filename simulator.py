@@ -0,0 +1,292 @@
+#
+# Simulated nRF5340 + nRF21540 Direct Test Mode firmware
+#
+# SPDX-License-Identifier: LicenseRef-LairdConnectivity-Clause
+#
+import logging
+from clock import SYSTEM_CLOCK, VirtualClock
+from dtm import (
+    CHANNEL_MAX,
+    DTM,
+    NRF5340_SOC_PWR_TABLE,
+    Command,
+    CommandType,
+    PacketType,
+    Phy,
+    ResponseStatus,
+    ResponseType,
+    TestSetup,
+    VendorSpecific,
+    packet_interval_us,
+)
+from transport import LoopbackTransport, register_transport
+
+logger = logging.getLogger(__name__)
+
+# Read supported features response (data length extension, 2M, and coded PHY)
+SUPPORTED_FEATURES = 0b1011
+# Read maximum (octets, time, octets, time) for TX and RX
+SUPPORTED_MAX = [251, 17040, 251, 17040]
+# Times are reported in 2 microsecond units so they fit in the 14-bit response
+READ_MAX_UNITS = [1, 2, 1, 2]
+PACKET_COUNT_MASK = 0x7FFF
+
+# The SET_PHY parameter (length field) is 1-4. Phy enum values contain
+# this value in the length field with the packet field set to 3.
+PHY_PARAMETERS = {(p.value >> 2): p for p in Phy}
+
+# The 6-bit frequency field holds the SoC power modulo 64
+SOC_POWER_FIELDS = {p & 0x3F: p for p in NRF5340_SOC_PWR_TABLE}
+
+
+class Transmission:
+    """
+    A transmit test (or constant carrier) as seen by the radio medium.
+    """
+
+    def __init__(self, channel: int, phy: Phy, packet_length: int, start: float):
+        self.channel = channel
+        self.phy = phy
+        self.packet_length = packet_length
+        self.start = start
+        self.end = None
+        # A constant carrier (no PHY) doesn't send packets
+        self.interval = 0
+        if phy is not None:
+            self.interval = packet_interval_us(phy, packet_length) / 1e6
+
+    def packets_between(self, start: float, end: float) -> int:
+        """
+        Number of complete packets sent between start and end.
+        """
+        if self.interval == 0:
+            return 0
+        stop = end if self.end is None else min(end, self.end)
+        window = stop - max(start, self.start)
+        if window <= 0:
+            return 0
+        return int(window / self.interval)
+
+
+class RadioMedium:
+    """
+    The "air" shared by simulated devices.
+
+    Receivers count packets from transmitters on the same channel using the same PHY.
+    """
+
+    def __init__(self, clock=None):
+        self.clock = VirtualClock() if clock is None else clock
+        self.transmissions = []
+        self.receivers = 0
+
+    def start_tx(self, channel: int, phy: Phy, packet_length: int) -> Transmission:
+        t = Transmission(channel, phy, packet_length, self.clock.now())
+        self.transmissions.append(t)
+        return t
+
+    def end_tx(self, t: Transmission):
+        t.end = self.clock.now()
+        self._prune()
+
+    def start_rx(self):
+        self.receivers += 1
+
+    def end_rx(self, channel: int, phy: Phy, start: float) -> int:
+        end = self.clock.now()
+        count = 0
+        for t in self.transmissions:
+            if t.channel == channel and t.phy == phy:
+                count += t.packets_between(start, end)
+        self.receivers -= 1
+        self._prune()
+        return count
+
+    def _prune(self):
+        # Completed transmissions are only of interest to running receivers
+        if self.receivers == 0:
+            self.transmissions = [t for t in self.transmissions if t.end is None]
+
+
+class SimulatedDUT:
+    """
+    Direct Test Mode firmware running on a simulated BL5340PA.
+
+    The object is a transport responder: it is called with the bytes written by
+    :py:class:`dtm.DTM` and returns the response bytes.
+    """
+
+    def __init__(self, medium: RadioMedium = None, name: str = "sim"):
+        self.medium = RadioMedium() if medium is None else medium
+        self.name = name
+        self._pending = b""
+        self.commands = 0
+        self.tx_power = 0
+        self.fem_gain = None
+        self.antenna = 0
+        self._tx = None
+        self._rx_start = None
+        self._reset()
+
+    def _reset(self):
+        self.end()
+        self.phy = Phy.PHY_1M
+        self.upper = 0
+        self.test = None
+        self.channel = 0
+        self.packet_length = 0
+        self.packet_type = PacketType.PRBS9
+
+    def __call__(self, data: bytes) -> bytes:
+        data = self._pending + data
+        rsp = b""
+        n = len(data) & ~1
+        for i in range(0, n, 2):
+            word = self.process(int.from_bytes(data[i : i + 2], "big"))
+            rsp += word.to_bytes(2, "big")
+        self._pending = data[n:]
+        return rsp
+
+    @staticmethod
+    def status(success: bool) -> int:
+        st = ResponseStatus.SUCCESS if success else ResponseStatus.FAILURE
+        return (ResponseType.STATUS.value << 15) | st.value
+
+    @staticmethod
+    def report(packet_count: int) -> int:
+        return (ResponseType.PACKET_REPORT.value << 15) | (
+            packet_count & PACKET_COUNT_MASK
+        )
+
+    @property
+    def running(self) -> bool:
+        return self.test is not None
+
+    def process(self, word: int) -> int:
+        """
+        Handle one 16-bit command and return the 16-bit response.
+        """
+        self.commands += 1
+        cmd = Command(word=word)
+        if cmd.cmd == CommandType.TEST_SETUP.value:
+            return self._test_setup(cmd.freq, cmd.length)
+        elif cmd.cmd == CommandType.END.value:
+            # The firmware answers with an error if no test is running
+            if not self.running:
+                return self.status(False)
+            return self.report(self.end())
+        elif cmd.pkt == PacketType.VS.value and cmd.cmd == CommandType.TX.value:
+            return self._vendor_specific(cmd.length, cmd.freq)
+        elif cmd.freq > CHANNEL_MAX:
+            return self.status(False)
+        else:
+            self.end()
+            self.channel = cmd.freq
+            self.packet_length = (self.upper << 6) | cmd.length
+            self.packet_type = PacketType(cmd.pkt)
+            self.test = CommandType(cmd.cmd)
+            if self.test == CommandType.TX:
+                self._tx = self.medium.start_tx(
+                    self.channel, self.phy, self.packet_length
+                )
+            else:
+                self.medium.start_rx()
+                self._rx_start = self.medium.clock.now()
+            return self.status(True)
+
+    def end(self) -> int:
+        """
+        End the running test and return the number of packets received.
+        """
+        count = 0
+        if self._tx is not None:
+            self.medium.end_tx(self._tx)
+            self._tx = None
+        if self._rx_start is not None:
+            count = self.medium.end_rx(self.channel, self.phy, self._rx_start)
+            self._rx_start = None
+        self.test = None
+        return count
+
+    def _test_setup(self, control: int, param: int) -> int:
+        if control == TestSetup.RESET.value:
+            self._reset()
+            return self.status(True)
+        elif self.running:
+            return self.status(False)
+        elif control == TestSetup.SET_UPPER.value:
+            if param > 3:
+                return self.status(False)
+            self.upper = param
+        elif control == TestSetup.SET_PHY.value:
+            if param not in PHY_PARAMETERS:
+                return self.status(False)
+            self.phy = PHY_PARAMETERS[param]
+        elif control == TestSetup.SELECT_MODULATION.value:
+            return self.status(param <= 1)
+        elif control == TestSetup.READ_SUPPORTED.value:
+            return SUPPORTED_FEATURES << 1
+        elif control == TestSetup.READ_MAX.value[0]:
+            if param >= len(SUPPORTED_MAX):
+                return self.status(False)
+            return (SUPPORTED_MAX[param] // READ_MAX_UNITS[param]) << 1
+        else:
+            return self.status(False)
+        return self.status(True)
+
+    def _vendor_specific(self, sub_cmd: int, param: int) -> int:
+        if sub_cmd in (
+            VendorSpecific.CARRIER_TEST.value,
+            VendorSpecific.CARRIER_TEST_STUDIO.value,
+        ):
+            if param > CHANNEL_MAX:
+                return self.status(False)
+            self.end()
+            self.channel = param
+            self.test = CommandType.TX
+            # A carrier isn't a packet so receivers don't count it
+            self._tx = self.medium.start_tx(self.channel, None, 0)
+            return self.status(True)
+        elif self.running:
+            return self.status(False)
+        elif sub_cmd == VendorSpecific.SET_TX_POWER.value:
+            if param not in SOC_POWER_FIELDS:
+                return self.status(False)
+            self.tx_power = SOC_POWER_FIELDS[param]
+        elif sub_cmd == VendorSpecific.FEM_ANTENNA_SELECT.value:
+            self.antenna = param
+        elif sub_cmd == VendorSpecific.FEM_GAIN_SET.value:
+            self.fem_gain = param
+        elif sub_cmd not in (
+            VendorSpecific.FEM_ACTIVE_DELAY_SET.value,
+            VendorSpecific.FEM_DEFAULT_PARAMS_SET.value,
+        ):
+            return self.status(False)
+        return self.status(True)
+
+
+def open_simulated_dtm(medium: RadioMedium = None, name: str = "sim") -> DTM:
+    """
+    Create a :py:class:`dtm.DTM` connected to a new simulated DUT.
+
+    DUTs created with the same medium can receive each other's packets.
+    """
+    if medium is None:
+        medium = RadioMedium()
+    sim = SimulatedDUT(medium, name)
+    transport = LoopbackTransport(sim, name=f"sim://{name}")
+    return DTM(transport=transport, clock=medium.clock)
+
+
+_default_medium = None
+
+
+def _open_sim(address: str, baudrate: int, timeout: float):
+    global _default_medium
+    if _default_medium is None:
+        _default_medium = RadioMedium(SYSTEM_CLOCK)
+    sim = SimulatedDUT(_default_medium, address)
+    return LoopbackTransport(sim, timeout, name=f"sim://{address}")
+
+
+register_transport("sim", _open_sim)
@@ -0,0 +1,105 @@
+#
+# Results of channel sweeps
+#
+# SPDX-License-Identifier: LicenseRef-LairdConnectivity-Clause
+#
+from enum import Enum
+
+
+class SweepMode(Enum):
+    """
+    Test run on each channel of a sweep.
+    """
+
+    TX = 0
+    """Modulated transmit test"""
+    CARRIER = 1
+    """Constant carrier (vendor specific)"""
+    RX = 2
+    """Receive test (packets are counted per channel)"""
+
+
+class ChannelDwell:
+    """
+    Timing of one channel of a sweep.
+
+    Times are from the clock used by DTM (seconds).
+    """
+
+    __slots__ = ("channel", "deadline", "sent", "start", "end", "packet_count")
+
+    def __init__(self, channel: int, deadline: float, sent: float, start: float):
+        self.channel = channel
+        self.deadline = deadline
+        """When the test should have started"""
+        self.sent = sent
+        """When the start command was sent"""
+        self.start = start
+        """When the start command was acknowledged"""
+        self.end = None
+        """When the end test command was sent"""
+        self.packet_count = None
+        """Packets received (receive sweep only)"""
+
+    @property
+    def dwell(self) -> float:
+        """
+        Time spent on the channel.
+        """
+        return self.end - self.start
+
+    @property
+    def jitter(self) -> float:
+        """
+        How late the start command was sent.
+        """
+        return self.sent - self.deadline
+
+
+class SweepReport:
+    """
+    Per-channel timing of a sweep.
+    """
+
+    def __init__(self, mode: SweepMode, dwell: float):
+        self.mode = mode
+        self.dwell = dwell
+        """Requested time on each channel"""
+        self.steps = []
+        """:py:class:`ChannelDwell` in the order they were run"""
+
+    @property
+    def max_jitter(self) -> float:
+        return max((s.jitter for s in self.steps), default=0.0)
+
+    @property
+    def mean_jitter(self) -> float:
+        if len(self.steps) == 0:
+            return 0.0
+        return sum(s.jitter for s in self.steps) / len(self.steps)
+
+    @property
+    def max_dwell_error(self) -> float:
+        """
+        Largest difference between the actual and requested time on a channel.
+        """
+        return max((abs(s.dwell - self.dwell) for s in self.steps), default=0.0)
+
+    def dwell_by_channel(self) -> dict:
+        """
+        :returns: channel to list of actual dwell times
+        """
+        result = {}
+        for s in self.steps:
+            result.setdefault(s.channel, []).append(s.dwell)
+        return result
+
+    def packets_by_channel(self) -> dict:
+        """
+        :returns: channel to total packets received (receive sweep only)
+        """
+        result = {}
+        for s in self.steps:
+            if s.packet_count is not None:
+                result[s.channel] = result.get(s.channel, 0) + s.packet_count
+        return result
@@ -0,0 +1,43 @@
+#
+# Drive many simulated devices from one event loop.
+#
+import asyncio
+from async_dtm import AsyncDTM
+from clock import VirtualClock
+from simulator import RadioMedium, SimulatedDUT
+from transport import LoopbackTransport
+
+
+async def main():
+    air = RadioMedium(VirtualClock())
+    duts = [
+        await AsyncDTM.open(
+            transport=LoopbackTransport(SimulatedDUT(air)), clock=air.clock
+        )
+        for _ in range(50)
+    ]
+    await asyncio.gather(*(dut.configure_for_ce() for dut in duts))
+    reports = await asyncio.gather(*(dut.start_tx_sweep(0.1) for dut in duts))
+    for dut, report in zip(duts, reports):
+        sim = dut.transport.transport.responder
+        assert sim.fem_gain == 23
+        assert sim.channel == 39
+        assert len(report.steps) == 40
+
+    # Channel changes are scheduled at deadlines, so command time doesn't accumulate
+    clock = VirtualClock()
+    sim = SimulatedDUT(RadioMedium(clock))
+
+    def slow(data: bytes) -> bytes:
+        clock.advance(0.005)
+        return sim(data)
+
+    dut = await AsyncDTM.open(transport=LoopbackTransport(slow), clock=clock)
+    start = clock.now()
+    report = await dut.start_tx_sweep(0.1)
+    assert [round(s.deadline - start, 6) for s in report.steps[:3]] == [0.0, 0.1, 0.2]
+    assert report.max_jitter < 0.02
+    assert clock.now() - start < 40 * 0.1 + 0.02
+
+
+asyncio.run(main())
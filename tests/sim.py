@@ -0,0 +1,440 @@
+#
+# Run the API against simulated devices (no hardware required).
+#
+import codec
+from discovery import discover
+from farm import DTMFarm
+import os
+import power_table
+import tempfile
+import threading
+import time
+from capture import RecordingTransport, ReplayTransport, replay_against
+from clock import VirtualClock
+from dtm import CHANNEL_MAX, DTM, SHADOW_REGISTERS, Command, Phy, Region, Response
+from per import run_per_matrix
+from plan import compile_plan, optimize_plan, run_plan, validate_plan
+from results import MemorySink
+from simulator import RadioMedium, SimulatedDUT, open_simulated_dtm
+from transport import LoopbackTransport, register_transport
+from sweep import SweepMode
+
+medium = RadioMedium(VirtualClock())
+dut1 = open_simulated_dtm(medium, "rx")
+dut2 = open_simulated_dtm(medium, "tx")
+sim1 = dut1.transport.responder
+sim2 = dut2.transport.responder
+
+# Settings are tracked by the firmware
+dut2.set_phy_2M()
+dut2.set_packet_length(73)
+dut2.set_tx_power(-8)
+dut2.set_fem_gain(20)
+assert sim2.phy == dut2.phy
+assert sim2.upper == 1
+assert sim2.tx_power == -8
+assert sim2.fem_gain == 20
+
+# Matched pair receives all packets
+dut1.set_phy_2M()
+dut1.start_rx_test(freq=2440)
+dut2.start_tx_test(freq=2440, duration=2)
+dut1.end_test()
+assert dut1.packet_count >= dut2.packet_count > 0
+# The virtual clock doesn't advance while commands are sent
+assert dut2.last_acked - dut2.last_sent == 0
+assert abs(dut1.packet_count - dut2.packet_count) <= dut2.packet_count_uncertainty
+
+# Mismatched PHY receives nothing
+dut1.set_phy_1M()
+dut1.start_rx_test(freq=2440)
+dut2.start_tx_test(freq=2440, duration=2)
+dut1.end_test()
+assert dut1.packet_count == 0
+
+# Setup is rejected while a test is running
+dut2.start_tx_test()
+assert sim2.running
+dut2.end_test()
+assert not sim2.running
+
+# Settings that don't change aren't sent again
+dut2.set_phy_2M()
+assert dut2.commands_saved["phy"] == 1
+
+# Receive sweep counts packets on each channel
+dut1.set_phy_2M()
+dut2.start_tx_test(freq=2440)
+report = dut1.sweep(SweepMode.RX, channels=[19, 0, 39], dwell=1)
+dut2.end_test()
+assert report.packets_by_channel()[19] > 0
+assert report.packets_by_channel()[0] == 0
+assert report.steps[-1].dwell == 1
+
+# Full sweep on every PHY takes (virtual) hours
+start = time.perf_counter()
+for phy in [dut2.set_phy_1M, dut2.set_phy_2M, dut2.set_phy_coded_s8, dut2.set_phy_coded_s2]:
+    phy()
+    dut2.start_tx_sweep(duration=30)
+assert medium.clock.now() > 3600
+assert time.perf_counter() - start < 5
+
+# Packet error rate matrix (PHY and length are changed least often)
+matrix = run_per_matrix(
+    dut2, dut1, channels=[0, 39], phys=[Phy.PHY_2M, Phy.CODED_PHY_S8],
+    packet_lengths=[37, 255], duration=0.5,
+)
+assert matrix.shape == (2, 2, 1, 1, 2)
+assert all(cell[-1] == 0.0 for cell in matrix.cells())
+assert matrix.received[matrix.index(Phy.CODED_PHY_S8, 255, None, matrix.axes[3][0], 39)] > 0
+
+# Long receive test doesn't overflow the 15-bit packet count
+dut2.set_phy_1M()
+dut2.set_packet_length(0)
+dut1.set_phy_1M()
+dut2.start_tx_test(freq=2440)
+series = dut1.long_rx_test(freq=2440, duration=100)
+dut2.end_test()
+assert len(series) > 1
+assert series.total > codec.PACKET_COUNT_MASK
+assert abs(series.total - 100 / 625e-6) <= len(series)
+
+# Results are emitted as records
+sink = MemorySink()
+dut1.sink = sink
+dut2.sink = sink
+dut1.start_rx_test(freq=2440)
+dut2.start_tx_test(freq=2440, duration=1)
+dut1.end_test()
+dut1.sweep(SweepMode.RX, channels=[0, 19], dwell=1)
+rx, tx = sink.results[1], sink.results[0]
+assert (tx.test, tx.dut, tx.channel, tx.packet_length) == ("TX", "sim://tx", 19, 0)
+assert tx.end - tx.start == 1 and tx.packet_count > 0
+assert rx.test == "RX" and rx.packet_count >= tx.packet_count
+assert [r.channel for r in sink.results[2:]] == [0, 19]
+
+# Raw words are kept in the wire trace
+dut2.reset_cmd()
+assert dut2.trace.entries()[-2:] == [(medium.clock.now(), 0, 0x0000), (medium.clock.now(), 1, 0x0000)]
+assert len(dut2.trace) == dut2.trace.size
+
+# A recorded session replays byte-for-byte
+path = os.path.join(tempfile.mkdtemp(), "session.cap")
+sim3 = SimulatedDUT(medium, "rec")
+recorder = RecordingTransport(LoopbackTransport(sim3), path, medium.clock)
+dut3 = DTM(transport=recorder, clock=medium.clock)
+dut3.configure_for_ce()
+dut3.start_tx_sweep(duration=0.1)
+recorder.close()
+replay = ReplayTransport(path)
+dut4 = DTM(transport=replay, clock=VirtualClock())
+dut4.configure_for_ce()
+dut4.start_tx_sweep(duration=0.1)
+assert replay.done and replay.mismatches == []
+assert replay_against(path, LoopbackTransport(SimulatedDUT(medium))) == []
+
+# Commands are counted by kind
+dut2.reset_stats()
+dut2.set_phy_2M()
+dut2.start_tx_test(freq=2440, duration=1)
+stats = dut2.stats()
+assert stats["TX"]["count"] == 1 and stats["END"]["count"] == 1
+assert stats["SETUP_SET_PHY"]["failures"] == 0
+assert stats["total"]["count"] == 3 and stats["total"]["timeouts"] == 0
+
+# Plans are compiled to the minimum commands
+plan = {"steps": [
+    {"test": "rx", "phy": "2M", "length": 255, "channels": [5, 6], "duration": 1},
+    {"test": "rx", "phy": "2M", "channels": [7], "duration": 1},
+]}
+compiled = compile_plan(plan, dut1)
+assert compiled.suppressed == 2
+assert compiled.commands == 7
+dut2.set_phy_2M()
+dut2.start_tx_test(freq=2412)
+counts = run_plan(dut1, compiled)
+dut2.end_test()
+assert [c[1] for c in counts] == [5, 6, 7]
+assert counts[0][2] > 0 and counts[1][2] == 0
+assert dut1.test.freq == 7 and dut1.phy == Phy.PHY_2M
+
+# Reordering steps removes setup commands
+plan = {"steps": [
+    {"test": "tx", "phy": phy, "length": length, "channels": [0], "duration": 1}
+    for length in (37, 255) for phy in ("1M", "2M", "CODED_S8")
+] + [{"test": "rx", "channels": [1], "duration": 1, "barrier": True}]}
+optimized, report = optimize_plan(plan, dut2)
+assert report["commands_after"] < report["commands_before"]
+assert report["order"][-1] == len(plan["steps"]) - 1
+assert optimized["steps"][-1]["phy"] == "CODED_S8" and optimized["steps"][-1]["length"] == 255
+
+# Values of the wrong type are reported as errors
+errors = validate_plan({"steps": [
+    {"test": "tx", "duration": "1", "fem_gain": "20", "channels": 5},
+]})
+assert len(errors) == 3
+assert validate_plan({"steps": "tx"}) == ["steps must be a list"]
+# A step must run on at least one channel
+empty = {"steps": [{"test": "tx", "channels": [0]}, {"test": "rx", "channels": []}]}
+assert validate_plan(empty) == ["Step 1: channels must not be empty"]
+assert compile_plan(empty) is None
+
+# Power tables are compiled once and reloaded from the cache
+with tempfile.TemporaryDirectory() as d:
+    saved = power_table.POWER_TABLE_DIR, power_table.CACHE_DIR, dict(power_table._regions)
+    power_table.POWER_TABLE_DIR, power_table.CACHE_DIR = d, os.path.join(d, "cache")
+    power_table._regions.clear()
+    with open(os.path.join(saved[0], "RCM.txt")) as f:
+        text = f.read()
+    with open(os.path.join(d, "RCM.txt"), "w") as f:
+        f.write(text)
+    compiled = power_table.load_region("RCM")
+    assert compiled == saved[2].get("RCM", compiled)
+    assert len(os.listdir(power_table.CACHE_DIR)) == 1
+    power_table._regions.clear()
+    assert power_table.load_region("RCM") == compiled
+    # A damaged cache file is compiled again
+    (cache,) = os.listdir(power_table.CACHE_DIR)
+    with open(os.path.join(power_table.CACHE_DIR, cache), "r+b") as f:
+        f.write(b"\x7f")
+    power_table._regions.clear()
+    assert power_table.load_region("RCM") == compiled
+    power_table._regions.clear()
+    assert power_table.load_region("RCM") == compiled
+    # A changed table isn't read from the old cache
+    with open(os.path.join(d, "RCM.txt"), "w") as f:
+        f.write(text.replace("EXTERNAL PHY_1M 5 ", "EXTERNAL PHY_1M 9 ", 1))
+    power_table._regions.clear()
+    assert power_table.load_region("RCM") != compiled
+    assert len(os.listdir(power_table.CACHE_DIR)) == 2
+    power_table.POWER_TABLE_DIR, power_table.CACHE_DIR = saved[:2]
+    power_table._regions.clear()
+    power_table._regions.update(saved[2])
+
+# Lost responses to idempotent commands are recovered by sending them again
+class Lossy:
+    def __init__(self, sim: SimulatedDUT):
+        self.sim = sim
+        self.drop = 0
+        self.extra = b""
+        self.cut = 0
+
+    def __call__(self, data: bytes) -> bytes:
+        rsp = self.sim(data)
+        if self.drop > 0:
+            self.drop -= 1
+            return b""
+        rsp = self.extra + rsp[: len(rsp) - self.cut]
+        self.extra = b""
+        self.cut = 0
+        return rsp
+
+
+lossy = Lossy(SimulatedDUT(medium))
+dut5 = DTM(transport=LoopbackTransport(lossy, timeout=0.3), clock=VirtualClock())
+for _ in range(16):
+    dut5.reset_cmd()
+assert dut5.response_timeout.value == dut5.response_timeout.floor
+lossy.drop = 1
+dut5.set_phy_2M()
+assert lossy.sim.phy == Phy.PHY_2M
+stats = dut5.stats()
+assert stats["SETUP_SET_PHY"]["retries"] == 1 and stats["SETUP_SET_PHY"]["timeouts"] == 1
+assert dut5.response_timeout.expirations == 1
+lossy.drop = 1
+dut5.send_batch([dut5._tx_power_command(-8), dut5._fem_gain_command(20)])
+assert lossy.sim.tx_power == -8 and lossy.sim.fem_gain == 20
+assert dut5.stats()["total"]["retries"] == 2
+# Starting a test isn't repeated
+lossy.drop = 1
+try:
+    dut5.start_tx_test()
+    assert False
+except Exception:
+    pass
+dut5.end_test()
+lossy.drop = 1 + dut5.retries
+try:
+    dut5.set_phy_1M()
+    assert False
+except Exception:
+    pass
+lossy.drop = 0
+# The attempts that fit in the budget time out
+stats = dut5.stats()["SETUP_SET_PHY"]
+assert stats["timeouts"] == stats["retries"] + 1 and stats["retries"] <= 1 + dut5.retries
+
+# The response stream is realigned after an extra or lost byte
+dut5.set_packet_length(100)
+dut5.set_tx_power(-4)
+dut5.reset_stats()
+lossy.extra = b"\x80"
+dut5.set_phy_2M()
+assert dut5.stats()["resyncs"] == 1
+assert lossy.sim.phy == Phy.PHY_2M and lossy.sim.upper == 1 and lossy.sim.tx_power == -4
+lossy.cut = 1
+try:
+    dut5.start_rx_test()
+    assert False
+except Exception:
+    pass
+assert dut5.stats()["resyncs"] == 2
+assert not lossy.sim.running and lossy.sim.upper == 1
+lossy.extra = b"\x80"
+dut5.send_batch([dut5._tx_power_command(-8), dut5._fem_gain_command(21)])
+assert lossy.sim.tx_power == -8 and lossy.sim.fem_gain == 21
+assert dut5.stats()["resyncs"] == 3
+dut5.start_rx_test()
+dut5.end_test()
+stats = dut5.stats()
+assert stats["total"]["failures"] == 3 and stats["total"]["retries"] == 2
+
+# A farm runs each DUT in its own thread and reports failures per DUT
+farm_sink = MemorySink()
+bad = Lossy(SimulatedDUT())
+bad_dut = DTM(transport=LoopbackTransport(bad, timeout=0.05, name="bad"), clock=VirtualClock())
+bad.drop = 1000
+with DTMFarm(
+    ports=["nosuch://port"],
+    duts=[open_simulated_dtm(RadioMedium(VirtualClock()), f"farm{i}") for i in range(3)]
+    + [bad_dut],
+    sink=farm_sink,
+) as farm:
+    assert list(farm.failures) == ["nosuch://port"]
+    result = farm.configure(Region.FCC_IC)
+    # Setting the region doesn't send commands
+    assert result.ok and len(result.results) == 4
+    result = farm.sweep(dwell=0.1)
+    assert list(result.failures) == ["bad"] and len(result.results) == 3
+    assert all(len(r.steps) == CHANNEL_MAX + 1 for r in result.results.values())
+    assert result.commands >= 3 * 2 * (CHANNEL_MAX + 1) and result.commands_per_second() > 0
+    result = farm.run_plan({"steps": [{"test": "tx", "phy": "2M", "duration": 1}]})
+    assert len(result.results) == 3 and "bad" in result.failures
+assert len(farm_sink.results) == 3 * (CHANNEL_MAX + 1)
+
+# Ports are probed in parallel and only DTM firmware is reported
+register_transport("silent", lambda address, baudrate, timeout: LoopbackTransport(
+    lambda data: b"", timeout))
+start = time.perf_counter()
+found = discover(
+    ["sim://d1", "loop://", "nosuch://port", "sim://d2"]
+    + [f"silent://{i}" for i in range(8)],
+    timeout=0.2,
+)
+assert time.perf_counter() - start < 0.2 * 4
+assert list(found) == ["sim://d1", "sim://d2"]
+assert found["sim://d1"]["max_tx_octets"] == 251
+assert "coded_phy" in found["sim://d1"]["features"]
+
+# The simulator answers like the firmware
+idle = SimulatedDUT()
+assert idle.process(codec.END_WORD) == SimulatedDUT.status(False)
+for param in range(4):
+    word = idle.process(codec.test_setup_word(5, param))
+    assert word < 0x8000 and word & 1 == 0
+
+# Ending a test on an idle DUT fails without losing sync
+dut5.reset_stats()
+dut5.end_test()
+assert dut5.stats()["resyncs"] == 0 and dut5.stats()["END"]["failures"] == 1
+assert DTM("loop://").stats()["resyncs"] == 0
+
+# A response that arrives after the adaptive timeout is used, not left for the next command
+class Delayed:
+    def __init__(self, sim: SimulatedDUT):
+        self.sim = sim
+        self.delay = 0
+        self.transport = None
+
+    def __call__(self, data: bytes) -> bytes:
+        rsp = self.sim(data)
+        if self.delay > 0:
+            threading.Timer(self.delay, self.transport.feed, [rsp]).start()
+            self.delay = 0
+            return b""
+        return rsp
+
+
+delayed = Delayed(SimulatedDUT(medium))
+delayed.transport = LoopbackTransport(delayed, timeout=0.5)
+dut6 = DTM(transport=delayed.transport, clock=VirtualClock())
+for _ in range(16):
+    dut6.reset_cmd()
+assert dut6.response_timeout.value == dut6.response_timeout.floor
+delayed.delay = dut6.response_timeout.floor + 0.1
+dut6.set_phy_2M()
+delayed.delay = dut6.response_timeout.value + 0.1
+dut6.start_tx_test()
+dut6.end_test()
+stats = dut6.stats()
+assert stats["SETUP_SET_PHY"]["retries"] == 1 and stats["resyncs"] == 0
+assert stats["TX"]["timeouts"] == 0 and stats["END"]["failures"] == 0
+assert dut6.response_timeout.late == 2
+
+# All attempts of a command fit in one ceiling
+delayed.transport.responder = lambda data: b""
+start = time.perf_counter()
+try:
+    dut6.set_phy_1M()
+    assert False
+except Exception:
+    pass
+elapsed = time.perf_counter() - start
+assert dut6.response_timeout.ceiling <= elapsed < dut6.response_timeout.ceiling + 0.2
+assert dut6.stats()["SETUP_SET_PHY"]["retries"] > 1
+
+# Commands after a reset in a batch are checked against the reset state
+dut7 = open_simulated_dtm(RadioMedium(VirtualClock()))
+dut7.set_phy_2M()
+phy_register = SHADOW_REGISTERS.index("phy")
+phy_2m = dut7._shadow[phy_register]
+dut7.send_batch([codec.RESET_WORD, phy_2m, phy_2m])
+assert dut7.transport.responder.phy == Phy.PHY_2M and dut7._shadow[phy_register] == phy_2m
+assert dut7.stats()["SETUP_SET_PHY"]["count"] == 2
+# and against the earlier commands of the batch
+dut7.set_phy_1M()
+dut7.set_tx_power(0)
+phy_1m = dut7._shadow[phy_register]
+dut7.send_batch([phy_2m, phy_1m, dut7._tx_power_command(-8), dut7._tx_power_command(0)])
+assert dut7.transport.responder.phy == Phy.PHY_1M and dut7._shadow[phy_register] == phy_1m
+assert dut7.transport.responder.tx_power == 0
+
+# DUTs with the same name are all kept
+with DTMFarm(duts=[open_simulated_dtm(RadioMedium(VirtualClock())) for _ in range(2)]) as farm:
+    assert list(farm.duts) == ["sim://sim", "sim://sim#2"]
+    assert len(farm.tx_test(duration=0.1).results) == 2
+
+# The codec has the same bit layout as the ctypes structures
+c = Command()
+for cmd in range(4):
+    for freq in range(codec.FIELD_MASK + 1):
+        for length in range(codec.FIELD_MASK + 1):
+            for pkt in range(4):
+                c.cmd, c.freq, c.length, c.pkt = cmd, freq, length, pkt
+                assert codec.encode(cmd, freq, length, pkt) == c.word
+                assert codec.TestCommand(cmd, freq, length, pkt).word == c.word
+                if cmd in (codec.CMD_TX, codec.CMD_RX) and freq < codec.CHANNELS and pkt < 3:
+                    start = codec.tx_start_word if cmd == codec.CMD_TX else codec.rx_start_word
+                    assert start(freq, length, pkt) == c.word
+                if cmd == codec.CMD_TX and pkt == codec.PKT_VS and length < codec.VS_COMMANDS:
+                    assert codec.vs_word(length, freq) == c.word
+                if cmd == codec.CMD_TEST_SETUP and pkt == 0:
+                    assert codec.test_setup_word(freq, length) == c.word
+    for value in (-1, -8, -40, 64):
+        c.cmd, c.freq, c.length, c.pkt = cmd, value, value, value
+        assert codec.encode(cmd, value, value, value) == c.word
+c = Command()
+for control in range(codec.FIELD_MASK + 1):
+    for param in range(0x100):
+        c.alt.cmd, c.alt.freq, c.alt.param = codec.CMD_TEST_SETUP, control, param
+        assert codec.test_setup_word(control, param, True) == c.word
+r = Response()
+for word in range(0x10000):
+    r.word = word
+    if r.ev:
+        assert codec.decode(word) == r.report.packet_count
+    else:
+        status = codec.STATUS_FAILURE if r.status.st else codec.STATUS_SUCCESS
+        assert codec.decode(word) == status
+        assert codec.status_data(word) == r.status.do_not_care
+    assert codec.decode_bytes(word.to_bytes(2, "big")) == codec.decode(word)
@@ -0,0 +1,440 @@
+#
+# Transports used to carry Direct Test Mode commands to a device under test
+#
+# SPDX-License-Identifier: LicenseRef-LairdConnectivity-Clause
+#
+import logging
+import os
+import select
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Transport:
+    """
+    Interface between :py:class:`dtm.DTM` and the device under test.
+
+    A transport is a byte pipe. DTM commands and responses are always
+    16 bits, so only whole writes and exact-length reads are required.
+    """
+
+    name = ""
+    """Human readable name of the port (used in log messages)"""
+
+    def open(self):
+        """
+        Open the underlying device. Transports are opened by their constructor,
+        so this is only required after :py:meth:`close`.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """
+        Close the underlying device.
+        """
+        raise NotImplementedError
+
+    def write(self, data):
+        """
+        Write all of data to the device under test.
+        """
+        raise NotImplementedError
+
+    def read_exact(self, size: int) -> bytes:
+        """
+        Read size bytes.
+
+        Fewer bytes (possibly none) are returned if the timeout expires.
+        """
+        raise NotImplementedError
+
+    def readinto(self, buf) -> int:
+        """
+        Fill buf (a bytearray or memoryview) without creating a new bytes object.
+
+        :returns: number of bytes read (less than len(buf) if the timeout expires)
+        """
+        b = self.read_exact(len(buf))
+        buf[: len(b)] = b
+        return len(b)
+
+    def fileno(self) -> int:
+        """
+        File descriptor that can be polled for received data (if supported).
+        """
+        raise OSError("Transport doesn't have a file descriptor")
+
+    def flush(self):
+        """
+        Wait until all written data has been sent.
+        """
+
+    def reset_input_buffer(self):
+        """
+        Discard any received data that has not been read.
+        """
+
+    @property
+    def timeout(self) -> float:
+        """
+        Read timeout in seconds.
+        """
+        return self._timeout
+
+    @timeout.setter
+    def timeout(self, value: float):
+        self._timeout = value
+
+    @property
+    def baudrate(self) -> int:
+        """
+        UART baud rate. Ignored by transports that aren't a UART.
+        """
+        return getattr(self, "_baudrate", None)
+
+    @baudrate.setter
+    def baudrate(self, value: int):
+        self._baudrate = value
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class SerialTransport(Transport):
+    """
+    UART transport (pyserial).
+    """
+
+    def __init__(self, port: str, baudrate: int, timeout: float):
+        import serial
+
+        self.name = port
+        self.serial = serial.Serial(port, baudrate, timeout=timeout)
+
+    def open(self):
+        self.serial.open()
+
+    def close(self):
+        self.serial.close()
+
+    def write(self, data):
+        self.serial.write(data)
+
+    def read_exact(self, size: int) -> bytes:
+        # pyserial blocks until size bytes are read or the timeout expires
+        return self.serial.read(size)
+
+    def readinto(self, buf) -> int:
+        return self.serial.readinto(buf)
+
+    def fileno(self) -> int:
+        return self.serial.fileno()
+
+    def flush(self):
+        self.serial.flush()
+
+    def reset_input_buffer(self):
+        self.serial.reset_input_buffer()
+
+    @property
+    def timeout(self) -> float:
+        return self.serial.timeout
+
+    @timeout.setter
+    def timeout(self, value: float):
+        self.serial.timeout = value
+
+    @property
+    def baudrate(self) -> int:
+        return self.serial.baudrate
+
+    @baudrate.setter
+    def baudrate(self, value: int):
+        self.serial.baudrate = value
+
+
+class _FdTransport(Transport):
+    """
+    Common read/write handling for transports built on a file descriptor.
+    """
+
+    def _wait_readable(self, deadline: float) -> bool:
+        remaining = deadline - time.monotonic()
+        if remaining < 0:
+            remaining = 0
+        r, _, _ = select.select([self.fd], [], [], remaining)
+        return len(r) > 0
+
+    def write(self, data):
+        view = memoryview(data)
+        while len(view) > 0:
+            n = os.write(self.fd, view)
+            view = view[n:]
+
+    def read_exact(self, size: int) -> bytes:
+        deadline = time.monotonic() + self._timeout
+        b = b""
+        while len(b) < size and self._wait_readable(deadline):
+            chunk = os.read(self.fd, size - len(b))
+            if len(chunk) == 0:
+                break
+            b += chunk
+        return b
+
+    def readinto(self, buf) -> int:
+        deadline = time.monotonic() + self._timeout
+        view = memoryview(buf)
+        n = 0
+        while n < len(view) and self._wait_readable(deadline):
+            chunk = os.readv(self.fd, [view[n:]])
+            if chunk == 0:
+                break
+            n += chunk
+        return n
+
+    def fileno(self) -> int:
+        return self.fd
+
+    def reset_input_buffer(self):
+        while len(select.select([self.fd], [], [], 0)[0]) > 0:
+            if len(os.read(self.fd, 4096)) == 0:
+                break
+
+
+class PtyTransport(_FdTransport):
+    """
+    Pseudo-terminal transport (POSIX only).
+
+    If path is None, a new pty pair is created. The device under test
+    (for example, a simulator running in another process) should open
+    :py:attr:`peer_name`.
+    """
+
+    def __init__(self, path: str = None, timeout: float = 1.0):
+        self.path = path
+        self.peer_name = None
+        self._peer_fd = None
+        self._timeout = timeout
+        self.fd = None
+        self.open()
+
+    def open(self):
+        import tty
+
+        if self.path is None:
+            self.fd, self._peer_fd = os.openpty()
+            tty.setraw(self._peer_fd)
+            self.peer_name = os.ttyname(self._peer_fd)
+            self.name = f"pty://{self.peer_name}"
+        else:
+            self.fd = os.open(self.path, os.O_RDWR | os.O_NOCTTY)
+            self.name = f"pty://{self.path}"
+        tty.setraw(self.fd)
+
+    def close(self):
+        for fd in (self.fd, self._peer_fd):
+            if fd is not None:
+                os.close(fd)
+        self.fd = None
+        self._peer_fd = None
+
+
+class SocketTransport(Transport):
+    """
+    TCP transport (for example, a serial server or a remote simulator).
+    """
+
+    def __init__(self, host: str, port: int, timeout: float = 1.0):
+        self.address = (host, port)
+        self.name = f"socket://{host}:{port}"
+        self._timeout = timeout
+        self.sock = None
+        self.open()
+
+    def open(self):
+        import socket
+
+        self.sock = socket.create_connection(self.address, self._timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock.settimeout(self._timeout)
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def write(self, data):
+        self.sock.sendall(data)
+
+    def fileno(self) -> int:
+        return self.sock.fileno()
+
+    def read_exact(self, size: int) -> bytes:
+        b = b""
+        deadline = time.monotonic() + self._timeout
+        while len(b) < size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self.sock.settimeout(remaining)
+            try:
+                chunk = self.sock.recv(size - len(b))
+            except TimeoutError:
+                break
+            if len(chunk) == 0:
+                break
+            b += chunk
+        return b
+
+    def readinto(self, buf) -> int:
+        view = memoryview(buf)
+        n = 0
+        deadline = time.monotonic() + self._timeout
+        while n < len(view):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self.sock.settimeout(remaining)
+            try:
+                chunk = self.sock.recv_into(view[n:])
+            except TimeoutError:
+                break
+            if chunk == 0:
+                break
+            n += chunk
+        return n
+
+    def reset_input_buffer(self):
+        self.sock.setblocking(False)
+        try:
+            while len(self.sock.recv(4096)) > 0:
+                pass
+        except BlockingIOError:
+            pass
+        finally:
+            self.sock.settimeout(self._timeout)
+
+
+class LoopbackTransport(Transport):
+    """
+    In-process transport.
+
+    Each write is passed to responder (a callable that takes the written bytes
+    and returns the bytes the device under test sends back).
+    If responder is None, written data is echoed.
+
+    Data can also be supplied by another thread using :py:meth:`feed`.
+    """
+
+    def __init__(self, responder=None, timeout: float = 1.0, name: str = "loop://"):
+        self.responder = responder
+        self.name = name
+        self._timeout = timeout
+        self._rx = bytearray()
+        self._cv = threading.Condition()
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def feed(self, data):
+        """
+        Append data to the receive buffer.
+        """
+        with self._cv:
+            self._rx += data
+            self._cv.notify_all()
+
+    def write(self, data):
+        if self.responder is None:
+            self.feed(data)
+        else:
+            rsp = self.responder(bytes(data))
+            if rsp:
+                self.feed(rsp)
+
+    def read_exact(self, size: int) -> bytes:
+        with self._cv:
+            if len(self._rx) < size and self._timeout > 0:
+                self._cv.wait_for(lambda: len(self._rx) >= size, self._timeout)
+            b = bytes(self._rx[:size])
+            del self._rx[:size]
+        return b
+
+    def readinto(self, buf) -> int:
+        size = len(buf)
+        with self._cv:
+            if len(self._rx) < size and self._timeout > 0:
+                self._cv.wait_for(lambda: len(self._rx) >= size, self._timeout)
+            n = min(size, len(self._rx))
+            buf[:n] = self._rx[:n]
+            del self._rx[:n]
+        return n
+
+    def reset_input_buffer(self):
+        with self._cv:
+            self._rx.clear()
+
+
+def _open_serial(address: str, baudrate: int, timeout: float):
+    return SerialTransport(address, baudrate, timeout)
+
+
+def _open_pty(address: str, baudrate: int, timeout: float):
+    return PtyTransport(address if address else None, timeout)
+
+
+def _open_socket(address: str, baudrate: int, timeout: float):
+    host, _, port = address.rpartition(":")
+    return SocketTransport(host, int(port), timeout)
+
+
+def _open_loopback(address: str, baudrate: int, timeout: float):
+    return LoopbackTransport(timeout=timeout)
+
+
+TRANSPORT_SCHEMES = {
+    "serial": _open_serial,
+    "pty": _open_pty,
+    "socket": _open_socket,
+    "loop": _open_loopback,
+}
+"""URL scheme to transport factory. Ports without a scheme use serial."""
+
+
+def register_transport(scheme: str, factory):
+    """
+    Add a transport that can be selected by URL.
+
+    :param str scheme: URL scheme (the part before ://)
+    :param factory: callable(address, baudrate, timeout) that returns a :py:class:`Transport`
+    """
+    TRANSPORT_SCHEMES[scheme] = factory
+
+
+def open_transport(url: str, baudrate: int, timeout: float) -> Transport:
+    """
+    Open a transport from a URL.\n
+    COM13 or /dev/ttyUSB0 = serial port\n
+    serial://COM13 = serial port\n
+    pty:// = new pseudo-terminal pair\n
+    pty:///dev/pts/4 = existing pseudo-terminal\n
+    socket://host:port = TCP\n
+    loop:// = in-process echo
+    """
+    scheme, sep, address = url.partition("://")
+    if sep == "":
+        scheme, address = "serial", url
+    try:
+        factory = TRANSPORT_SCHEMES[scheme]
+    except KeyError:
+        raise ValueError(f"Unsupported transport '{scheme}'")
+    logger.debug(f"Opening {scheme} transport {address}")
+    return factory(address, baudrate, timeout)
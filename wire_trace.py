@@ -0,0 +1,70 @@
+#
+# Ring buffer of the raw command and response words sent to a DUT
+#
+# SPDX-License-Identifier: LicenseRef-LairdConnectivity-Clause
+#
+from array import array
+
+TX = 0
+"""Command sent to the DUT"""
+RX = 1
+"""Response received from the DUT"""
+MISSING = -1
+"""Word stored when a response isn't received"""
+
+_DIRECTIONS = ("Tx", "Rx")
+
+
+class WireTrace:
+    """
+    The last size words sent and received, with their times.
+
+    Adding a word only stores into preallocated arrays, so the trace can be
+    left on permanently. Use :py:meth:`format` to see it (e.g., after a failure).
+    """
+
+    __slots__ = ("size", "count", "_times", "_words")
+
+    def __init__(self, size: int = 256):
+        self.size = size
+        self.count = 0
+        """Total number of words added"""
+        self._times = array("d", [0.0]) * size
+        # Word in the lower 16 bits (or MISSING), direction in bit 16
+        self._words = array("l", [0]) * size
+
+    def add(self, t: float, direction: int, word: int):
+        i = self.count % self.size
+        self._times[i] = t
+        self._words[i] = (direction << 16) | word if word >= 0 else -1 - direction
+        self.count += 1
+
+    def clear(self):
+        self.count = 0
+
+    def __len__(self) -> int:
+        return min(self.count, self.size)
+
+    def entries(self) -> list:
+        """
+        :returns: (time, direction, word) oldest first
+        """
+        result = []
+        for n in range(self.count - len(self), self.count):
+            i = n % self.size
+            w = self._words[i]
+            if w < 0:
+                result.append((self._times[i], -1 - w, MISSING))
+            else:
+                result.append((self._times[i], w >> 16, w & 0xFFFF))
+        return result
+
+    def format(self) -> str:
+        """
+        :returns: one line per word (e.g., "12.345678 Tx 8000")
+        """
+        lines = []
+        for t, direction, word in self.entries():
+            text = "----" if word == MISSING else f"{word:04x}"
+            lines.append(f"{t:.6f} {_DIRECTIONS[direction]} {text}")
+        return "\n".join(lines)